@@ -2,14 +2,23 @@ import csv
 import random
 
 import matplotlib.pyplot as plt
+import numpy as np
 
+BUY = 0
+SELL = 1
 
-def make_random_orders():
+# binary order file: magic, order count, then the price, qty and side columns back to back
+ORDER_FILE_MAGIC = b'CAORDER1'
+ORDER_FILE_HEADER = np.dtype([('magic', 'S8'), ('count', '<u8')])
+
+
+def make_random_orders(count=1000, seed=None):
+    rng = random.Random(seed)
     buy_orders, sell_orders = [], []
-    prices = [random.normalvariate(100, 30) for i in range(1, 1001)]
+    prices = [rng.normalvariate(100, 30) for i in range(count)]
     for price in prices:
-        side = random.choice(['buy', 'sell'])
-        qty = int(random.normalvariate(20, 5))
+        side = rng.choice(['buy', 'sell'])
+        qty = int(rng.normalvariate(20, 5))
         if side.lower() == 'sell':
             sell_orders.append((price, qty))
         else:
@@ -20,6 +29,34 @@ def make_random_orders():
     return buy_orders, sell_orders
 
 
+def make_random_order_columns(count, seed=None, price_distribution='normal', size_distribution='normal'):
+    """ Generate random orders as (prices, sides, qtys) columns with a seeded generator.
+    price_distribution: 'normal' around 100, 'skewed' (log-normal, long upper tail) or 'uniform'
+    size_distribution: 'normal' around 20 or 'lumpy' (mostly small lots with occasional blocks)
+    """
+    rng = np.random.default_rng(seed)
+    if price_distribution == 'normal':
+        prices = rng.normal(100.0, 30.0, count)
+    elif price_distribution == 'skewed':
+        prices = 100.0 * rng.lognormal(0.0, 0.5, count)
+    elif price_distribution == 'uniform':
+        prices = rng.uniform(50.0, 150.0, count)
+    else:
+        raise ValueError(f'Unknown price distribution: {price_distribution}')
+    prices = np.round(np.maximum(prices, 0.01), 2)
+
+    sides = rng.integers(BUY, SELL + 1, count, dtype=np.uint8)
+
+    if size_distribution == 'normal':
+        qtys = np.maximum(np.rint(rng.normal(20.0, 5.0, count)), 1.0)
+    elif size_distribution == 'lumpy':
+        lots = rng.choice([1.0, 5.0, 10.0, 100.0, 1000.0], size=count, p=[0.4, 0.3, 0.2, 0.09, 0.01])
+        qtys = lots * rng.integers(1, 10, count)
+    else:
+        raise ValueError(f'Unknown size distribution: {size_distribution}')
+    return prices, sides, qtys
+
+
 def read_orders_from_file(file_name):
     """ Read and sort all orders from a file.
     The file contains orders in the format: price, side, quantity
@@ -44,92 +81,215 @@ def read_orders_from_file(file_name):
     return buy_orders, sell_orders
 
 
+def read_order_columns(file_name):
+    """ Read all orders from a text file straight into NumPy columns.
+    The file has the same price, side, quantity format as read_orders_from_file.
+    Returns (prices, sides, qtys) in file order, with sides coded as BUY/SELL.
+    """
+    columns = np.loadtxt(file_name, delimiter=',', ndmin=1, encoding='utf-8',
+                         dtype=[('price', 'f8'), ('side', 'U8'), ('qty', 'f8')])
+    prices = np.round(columns['price'], 2)
+    sides = np.where(np.char.lower(np.char.strip(columns['side'])) == 'sell', SELL, BUY).astype(np.uint8)
+    return prices, sides, columns['qty']
+
+
+def write_order_columns_binary(file_name, prices, sides, qtys):
+    """ Write order columns to the compact binary order format.
+    """
+    header = np.array([(ORDER_FILE_MAGIC, len(prices))], dtype=ORDER_FILE_HEADER)
+    with open(file_name, 'wb') as binary_file:
+        header.tofile(binary_file)
+        np.ascontiguousarray(prices, dtype='<f8').tofile(binary_file)
+        np.ascontiguousarray(qtys, dtype='<f8').tofile(binary_file)
+        np.ascontiguousarray(sides, dtype=np.uint8).tofile(binary_file)
+
+
+def read_order_columns_binary(file_name):
+    """ Memory-map the columns of a binary order file.
+    Returns read-only (prices, sides, qtys) arrays backed by the file.
+    """
+    header = np.fromfile(file_name, dtype=ORDER_FILE_HEADER, count=1)
+    if len(header) == 0 or header['magic'][0] != ORDER_FILE_MAGIC:
+        raise ValueError(f'{file_name} is not a binary order file.')
+    count = int(header['count'][0])
+    if count == 0:
+        return np.empty(0), np.empty(0, dtype=np.uint8), np.empty(0)
+
+    offset = ORDER_FILE_HEADER.itemsize
+    prices = np.memmap(file_name, dtype='<f8', mode='r', offset=offset, shape=(count,))
+    offset += 8 * count
+    qtys = np.memmap(file_name, dtype='<f8', mode='r', offset=offset, shape=(count,))
+    offset += 8 * count
+    sides = np.memmap(file_name, dtype=np.uint8, mode='r', offset=offset, shape=(count,))
+    return prices, sides, qtys
+
+
+def order_columns(orders):
+    """ Split a list of (price, qty) orders into a price array and a quantity array.
+    """
+    if len(orders) == 0:
+        return np.empty(0), np.empty(0)
+    prices, qtys = zip(*orders)
+    return np.array(prices, dtype=float), np.array(qtys)
+
+
+def build_auction_table(buy_prices, buy_qtys, sell_prices, sell_qtys):
+    """ Compute the call-auction table from order columns in O(n log n).
+    Returns the ascending union of all order prices together with the
+    cumulative supply (sells at or below each price) and the cumulative
+    demand (buys at or above each price) at those prices.
+    """
+    sell_index = np.argsort(sell_prices, kind='stable')
+    sell_prices = sell_prices[sell_index]
+    sell_qtys = sell_qtys[sell_index]
+
+    buy_index = np.argsort(buy_prices, kind='stable')
+    buy_prices = buy_prices[buy_index]
+    buy_qtys = buy_qtys[buy_index]
+
+    prices = np.union1d(buy_prices, sell_prices)
+
+    # supply: running total of sells from the lowest price up
+    supply_cum = np.concatenate((np.zeros(1, dtype=sell_qtys.dtype), np.cumsum(sell_qtys)))
+    supply = supply_cum[np.searchsorted(sell_prices, prices, side='right')]
+
+    # demand: running total of buys from the highest price down
+    demand_cum = np.concatenate((np.zeros(1, dtype=buy_qtys.dtype), np.cumsum(buy_qtys[::-1])))
+    demand = demand_cum[len(buy_prices) - np.searchsorted(buy_prices, prices, side='left')]
+
+    return prices, supply, demand
+
+
+def aggregate_levels(prices, qtys):
+    """ Sum order quantities per distinct price; returns ascending level prices and their quantities.
+    """
+    level_prices, level_index = np.unique(prices, return_inverse=True)
+    level_qtys = np.bincount(level_index.ravel(), weights=qtys, minlength=len(level_prices))
+    return level_prices, level_qtys.astype(qtys.dtype, copy=False)
+
+
+def fill_levels(level_qtys, crossing, executed_qty):
+    """ Quantities left per level once executed_qty has been filled from the
+    crossing levels, the levels being given in price priority.
+    """
+    crossing_qtys = np.where(crossing, level_qtys, 0)
+    filled_before = np.cumsum(crossing_qtys) - crossing_qtys
+    return level_qtys - np.clip(executed_qty - filled_before, 0, crossing_qtys)
+
+
+def find_clearing_index(supply, demand):
+    """ Index of the first price at which supply covers demand.
+    Supply is non-decreasing and demand non-increasing in price, so the excess
+    supply is sorted and the crossing point can be found by binary search.
+    Returns len(supply) if the curves never cross.
+    """
+    return int(np.searchsorted(supply - demand, 0, side='left'))
+
+
 class CallAuction(object):
 
     def __init__(self, buy_orders, sell_orders):
         self.buy_orders = buy_orders
         self.sell_orders = sell_orders
+        self.buy_prices, self.buy_qtys = order_columns(buy_orders)
+        self.sell_prices, self.sell_qtys = order_columns(sell_orders)
         self.call_auction_table_supply = {}
         self.call_auction_table_demand = {}
         self.prices = []
+        self.price_levels = None
+        self.supply_levels = None
+        self.demand_levels = None
         self.clearing_price = None
         self.clearing_qty = None
         self.bid_side = {}
         self.ask_side = {}
+        self.residual_bid_prices = np.empty(0)
+        self.residual_bid_qtys = np.empty(0)
+        self.residual_ask_prices = np.empty(0)
+        self.residual_ask_qtys = np.empty(0)
+
+    @classmethod
+    def from_columns(cls, prices, sides, qtys):
+        """ Create an auction directly from price, side and quantity columns,
+        e.g. as returned by read_order_columns or read_order_columns_binary.
+        No per-order tuples are built, so buy_orders and sell_orders are left empty.
+        """
+        prices, qtys = np.asarray(prices, dtype=float), np.asarray(qtys)
+        is_sell = np.asarray(sides) == SELL
+        call_auction = cls([], [])
+        call_auction.buy_prices, call_auction.buy_qtys = prices[~is_sell], qtys[~is_sell]
+        call_auction.sell_prices, call_auction.sell_qtys = prices[is_sell], qtys[is_sell]
+        return call_auction
 
     def compute_clearing_price(self):
+        """ Build the call-auction table and find the clearing price.
+        Supply at a price is the quantity of all sells at or below it and demand
+        is the quantity of all buys at or above it; the clearing price is the
+        lowest price at which supply covers demand.
+        """
 
-        # compute supply and demand
-        supply = []
-        for i in range(len(self.sell_orders)):
-            qty_sum = 0
-            for j in range(len(self.sell_orders[:i + 1])):
-                qty_sum += self.sell_orders[j][1]
-            supply.append((self.sell_orders[i][0], qty_sum))
-        supply = dict(supply)
-
-
-        demand = []
-        for i in range(len(self.buy_orders)):
-            qty_sum = 0
-            for j in range(len(self.buy_orders[:i + 1])):
-                qty_sum += self.buy_orders[j][1]
-            demand.append((self.buy_orders[i][0], qty_sum))
-        demand.reverse()
-        demand = dict(demand)
+        self.price_levels, self.supply_levels, self.demand_levels = \
+            build_auction_table(self.buy_prices, self.buy_qtys, self.sell_prices, self.sell_qtys)
 
         # create the call-auction table
-        supply_prices = set(supply.keys())
-        demand_prices = set(demand.keys())
-        self.prices = list(demand_prices.union(supply_prices))
-        self.prices.sort(reverse=False)
-        self.call_auction_table_supply, self.call_auction_table_demand = {}, {}
-        for index, price in enumerate(self.prices):
-            if price in supply_prices:
-                self.call_auction_table_supply[price] = supply[price]
-            elif index == 0:
-                self.call_auction_table_supply[price] = 0
-            else:
-                self.call_auction_table_supply[price] = \
-                    self.call_auction_table_supply[self.prices[index - 1]]
-
-        self.prices.sort(reverse=True)
-        for index, price in enumerate(self.prices):
-            if price in demand_prices:
-                self.call_auction_table_demand[price] = demand[price]
-            elif index == 0:
-                self.call_auction_table_demand[price] = 0
-            else:
-                self.call_auction_table_demand[price] = \
-                    self.call_auction_table_demand[self.prices[index - 1]]
-
-        # iterate over prices to find the clearing price
-        self.prices.sort(reverse=False)
-        for price in self.prices:
-            if self.call_auction_table_supply[price] >= self.call_auction_table_demand[price]:
-                self.clearing_price = price
-                self.clearing_qty = min(self.call_auction_table_supply[price],
-                                        self.call_auction_table_demand[price])
-                break
-
+        self.prices = self.price_levels.tolist()
+        self.call_auction_table_supply = dict(zip(self.prices, self.supply_levels.tolist()))
+        self.call_auction_table_demand = dict(zip(self.prices[::-1], self.demand_levels[::-1].tolist()))
+
+        # binary search for the clearing price
+        index = find_clearing_index(self.supply_levels, self.demand_levels)
+        if index < len(self.prices):
+            self.clearing_price = self.prices[index]
+            self.clearing_qty = min(self.call_auction_table_supply[self.clearing_price],
+                                    self.call_auction_table_demand[self.clearing_price])
+        else:
+            self.clearing_price = None
+            self.clearing_qty = None
 
         return True if self.clearing_price else False
 
     def compute_orderbook(self):
-
-        for buy_order in self.buy_orders:
-            if buy_order[0] < self.clearing_price:
-                if buy_order[0] in self.bid_side:
-                    self.bid_side[buy_order[0]] += buy_order[1]
-                else:
-                    self.bid_side[buy_order[0]] = buy_order[1]
-
-        for sell_order in self.sell_orders:
-            if sell_order[0] > self.clearing_price:
-                if sell_order[0] in self.ask_side:
-                    self.ask_side[sell_order[0]] += sell_order[1]
-                else:
-                    self.ask_side[sell_order[0]] = sell_order[1]
+        """ Build the residual order book left after the auction with array operations.
+        Buys at or above and sells at or below the clearing price cross; the
+        clearing quantity is filled from each side's crossing levels in price
+        priority, so the side in excess keeps its unexecuted quantity, usually
+        at the clearing price itself. Everything else stays in the book. The
+        quantities left are summed per price level into residual_bid_prices/qtys
+        (descending) and residual_ask_prices/qtys (ascending), which also back
+        the bid_side and ask_side dicts.
+        """
+        # without a clearing price nothing executes, so no level crosses
+        clearing_price = np.nan if self.clearing_price is None else self.clearing_price
+        clearing_qty = self.clearing_qty or 0
+
+        bid_prices, bid_qtys = aggregate_levels(self.buy_prices, self.buy_qtys)
+        bid_prices, bid_qtys = bid_prices[::-1], bid_qtys[::-1]
+        bid_qtys = fill_levels(bid_qtys, bid_prices >= clearing_price, clearing_qty)
+        resting = bid_qtys > 0
+        self.residual_bid_prices, self.residual_bid_qtys = bid_prices[resting], bid_qtys[resting]
+
+        ask_prices, ask_qtys = aggregate_levels(self.sell_prices, self.sell_qtys)
+        ask_qtys = fill_levels(ask_qtys, ask_prices <= clearing_price, clearing_qty)
+        resting = ask_qtys > 0
+        self.residual_ask_prices, self.residual_ask_qtys = ask_prices[resting], ask_qtys[resting]
+
+        self.bid_side = dict(zip(self.residual_bid_prices.tolist(), self.residual_bid_qtys.tolist()))
+        self.ask_side = dict(zip(self.residual_ask_prices.tolist(), self.residual_ask_qtys.tolist()))
+
+    def write_orderbook(self, file_name):
+        """ Export the residual order book as columns: side, price, quantity.
+        Files ending in .npz are written as binary NumPy columns, anything else as CSV.
+        """
+        sides = np.concatenate((np.full(len(self.residual_bid_prices), BUY, dtype=np.uint8),
+                                np.full(len(self.residual_ask_prices), SELL, dtype=np.uint8)))
+        prices = np.concatenate((self.residual_bid_prices, self.residual_ask_prices))
+        qtys = np.concatenate((self.residual_bid_qtys, self.residual_ask_qtys))
+        if file_name.lower().endswith('.npz'):
+            np.savez(file_name, side=sides, price=prices, qty=qtys)
+        else:
+            side_names = np.array(['buy', 'sell'])[sides]
+            np.savetxt(file_name, np.column_stack((side_names, prices.astype(str), qtys.astype(str))),
+                       fmt='%s', delimiter=',', header='side,price,qty', comments='')
 
     def plot_supply_vs_demand(self):
 
@@ -179,10 +339,10 @@ class CallAuction(object):
 
 def main():
     orders_file_name = 'Orders.txt'
-    buy_orders, sell_orders = read_orders_from_file(orders_file_name)
+    call_auction = CallAuction.from_columns(*read_order_columns(orders_file_name))
+    # buy_orders, sell_orders = read_orders_from_file(orders_file_name)
     # buy_orders, sell_orders = make_random_orders()
-
-    call_auction = CallAuction(buy_orders, sell_orders)
+    # call_auction = CallAuction(buy_orders, sell_orders)
     if call_auction.compute_clearing_price():
         call_auction.plot_supply_vs_demand()
     else:
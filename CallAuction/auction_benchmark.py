@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from CallAuction import CallAuction, make_random_order_columns
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'call_auction'))
+from orderbook import Order, OrderBook  # noqa: E402
+
+BENCHMARKS = ['clearing_price', 'orderbook', 'matching']
+
+
+def latency_summary(latencies):
+    """ Percentiles of a list of latencies, in microseconds.
+    """
+    latencies = np.asarray(latencies) * 1e6
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {'latency_p50_us': p50, 'latency_p90_us': p90, 'latency_p99_us': p99,
+            'latency_max_us': latencies.max()}
+
+
+def bench_clearing_price(columns, repeats):
+    latencies = []
+    for _ in range(repeats):
+        call_auction = CallAuction.from_columns(*columns)
+        start = time.perf_counter()
+        call_auction.compute_clearing_price()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_orderbook(columns, repeats):
+    latencies = []
+    for _ in range(repeats):
+        call_auction = CallAuction.from_columns(*columns)
+        if not call_auction.compute_clearing_price():
+            break
+        start = time.perf_counter()
+        call_auction.compute_orderbook()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_matching(columns):
+    """ Feed every order through OrderBook.process_order and time each call.
+    """
+    prices, sides, qtys = columns
+    orders = [Order(side, price, int(qty))
+              for price, side, qty in zip(prices.tolist(), sides.tolist(), qtys.tolist())]
+    order_book = OrderBook()
+    process_order = order_book.process_order
+    clock = time.perf_counter
+    latencies = np.empty(len(orders))
+    for index, order in enumerate(orders):
+        start = clock()
+        process_order(order)
+        latencies[index] = clock() - start
+    return latencies
+
+
+def run_benchmark(benchmark, count, seed, price_distribution, size_distribution, repeats):
+    """ Run one benchmark case and return its result record.
+    Throughput is orders per second of the median run for the auction benchmarks
+    and of the whole order stream for the matching benchmark.
+    """
+    columns = make_random_order_columns(count, seed, price_distribution, size_distribution)
+    if benchmark == 'clearing_price':
+        latencies = bench_clearing_price(columns, repeats)
+        throughput = count / np.median(latencies)
+    elif benchmark == 'orderbook':
+        latencies = bench_orderbook(columns, repeats)
+        throughput = count / np.median(latencies) if latencies else float('nan')
+    elif benchmark == 'matching':
+        latencies = bench_matching(columns)
+        throughput = count / latencies.sum()
+    else:
+        raise ValueError(f'Unknown benchmark: {benchmark}')
+
+    result = {'benchmark': benchmark, 'orders': count, 'seed': seed,
+              'price_distribution': price_distribution, 'size_distribution': size_distribution,
+              'samples': len(latencies), 'throughput_orders_per_s': throughput}
+    if len(latencies):
+        result.update(latency_summary(latencies))
+    return {key: value.item() if isinstance(value, np.generic) else value for key, value in result.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the call auction and order book.')
+    parser.add_argument('--benchmarks', nargs='+', default=BENCHMARKS, choices=BENCHMARKS)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--price-distributions', nargs='+', default=['normal'],
+                        choices=['normal', 'skewed', 'uniform'])
+    parser.add_argument('--size-distributions', nargs='+', default=['normal'], choices=['normal', 'lumpy'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default=None, help='JSON lines file, defaults to stdout')
+    args = parser.parse_args()
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for benchmark in args.benchmarks:
+            for count in args.sizes:
+                for price_distribution in args.price_distributions:
+                    for size_distribution in args.size_distributions:
+                        result = run_benchmark(benchmark, count, args.seed, price_distribution,
+                                               size_distribution, args.repeats)
+                        output.write(json.dumps(result) + '\n')
+                        output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
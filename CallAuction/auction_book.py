@@ -0,0 +1,159 @@
+from CallAuction import CallAuction
+
+
+class FenwickTree(object):
+    """ Binary indexed tree over a fixed number of slots.
+    Supports point updates, prefix sums and lower-bound searches on the prefix
+    sums in O(log n); the stored values must stay non-negative for the search.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.top_step = 1
+        while self.top_step * 2 <= size:
+            self.top_step *= 2
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, count):
+        """ Sum of the first count slots.
+        """
+        total = 0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+    def lower_bound(self, target):
+        """ Smallest slot index whose inclusive prefix sum reaches target.
+        Returns size if the total never reaches it.
+        """
+        position, remaining = 0, target
+        step = self.top_step
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] < remaining:
+                position = next_position
+                remaining -= self.tree[next_position]
+            step >>= 1
+        return position
+
+
+class AuctionBook(object):
+    """ Incremental call-auction book for the pre-open phase.
+    Orders live on a fixed price-tick grid and the per-tick buy and sell
+    quantities are kept in Fenwick trees, so adding, cancelling or amending an
+    order and querying the indicative clearing price and quantity all cost
+    O(log n) in the number of ticks. The clearing rule is the one used by
+    CallAuction: the lowest order price at which supply covers demand.
+    """
+
+    def __init__(self, min_price, max_price, tick_size=0.01):
+        self.min_price = min_price
+        self.max_price = max_price
+        self.tick_size = tick_size
+        self.tick_count = int(round((max_price - min_price) / tick_size)) + 1
+
+        self.orders = {}
+        self.total_buy_qty = 0
+        self.total_sell_qty = 0
+        self.buy_qtys = FenwickTree(self.tick_count)
+        self.sell_qtys = FenwickTree(self.tick_count)
+        # sells at tick t plus buys at tick t - 1: its prefix sum through tick t is
+        # supply(t) + (total demand - demand(t)), which reaches the total demand
+        # exactly where supply first covers demand
+        self.crossing = FenwickTree(self.tick_count + 1)
+        self.order_counts = FenwickTree(self.tick_count)
+
+    def price_to_tick(self, price):
+        tick = int(round((price - self.min_price) / self.tick_size))
+        if tick < 0 or tick >= self.tick_count:
+            raise ValueError(f'Price {price} is outside the auction price range '
+                             f'[{self.min_price}, {self.max_price}].')
+        return tick
+
+    def tick_to_price(self, tick):
+        return round(self.min_price + tick * self.tick_size, 8)
+
+    def _insert(self, side, tick, qty):
+        if side == 'sell':
+            self.sell_qtys.add(tick, qty)
+            self.crossing.add(tick, qty)
+            self.total_sell_qty += qty
+        else:
+            self.buy_qtys.add(tick, qty)
+            self.crossing.add(tick + 1, qty)
+            self.total_buy_qty += qty
+
+    def add_order(self, order_id, side, price, qty):
+        if order_id in self.orders:
+            raise KeyError(f'Order {order_id} is already in the book.')
+        side = side.strip().lower()
+        tick = self.price_to_tick(price)
+        self.orders[order_id] = (side, tick, qty)
+        self._insert(side, tick, qty)
+        self.order_counts.add(tick, 1)
+
+    def cancel_order(self, order_id):
+        side, tick, qty = self.orders.pop(order_id)
+        self._insert(side, tick, -qty)
+        self.order_counts.add(tick, -1)
+
+    def amend_order(self, order_id, price=None, qty=None):
+        side, tick, old_qty = self.orders[order_id]
+        new_tick = tick if price is None else self.price_to_tick(price)
+        new_qty = old_qty if qty is None else qty
+        self._insert(side, tick, -old_qty)
+        self._insert(side, new_tick, new_qty)
+        if new_tick != tick:
+            self.order_counts.add(tick, -1)
+            self.order_counts.add(new_tick, 1)
+        self.orders[order_id] = (side, new_tick, new_qty)
+
+    def supply_at(self, price):
+        """ Quantity of all sell orders at or below price.
+        """
+        return self.sell_qtys.prefix_sum(self.price_to_tick(price) + 1)
+
+    def demand_at(self, price):
+        """ Quantity of all buy orders at or above price.
+        """
+        return self.total_buy_qty - self.buy_qtys.prefix_sum(self.price_to_tick(price))
+
+    def indicative_price(self):
+        """ Current indicative clearing price and quantity.
+        Returns (None, None) if supply never covers demand at any order price.
+        """
+        if not self.orders:
+            return None, None
+
+        # first tick at which supply covers demand, then the first order price from there
+        crossing_tick = self.crossing.lower_bound(self.total_buy_qty)
+        if crossing_tick >= self.tick_count:
+            return None, None
+        orders_below = self.order_counts.prefix_sum(crossing_tick)
+        tick = self.order_counts.lower_bound(orders_below + 1)
+        if tick >= self.tick_count:
+            return None, None
+
+        supply = self.sell_qtys.prefix_sum(tick + 1)
+        demand = self.total_buy_qty - self.buy_qtys.prefix_sum(tick)
+        return self.tick_to_price(tick), min(supply, demand)
+
+    def to_call_auction(self):
+        """ Snapshot the book into a CallAuction for the full auction run.
+        """
+        buy_orders, sell_orders = [], []
+        for side, tick, qty in self.orders.values():
+            if side == 'sell':
+                sell_orders.append((self.tick_to_price(tick), qty))
+            else:
+                buy_orders.append((self.tick_to_price(tick), qty))
+        sell_orders.sort(key=lambda x: x[0], reverse=False)
+        buy_orders.sort(key=lambda x: x[0], reverse=True)
+        return CallAuction(buy_orders, sell_orders)
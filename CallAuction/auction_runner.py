@@ -0,0 +1,94 @@
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from CallAuction import CallAuction, read_order_columns, read_order_columns_binary
+
+RESULT_COLUMNS = ['symbol', 'clearing_price', 'clearing_qty',
+                  'bid_levels', 'bid_depth', 'ask_levels', 'ask_depth']
+
+
+def read_manifest(file_name):
+    """ Read a manifest of per-symbol order files.
+    Each row is: symbol, order file; relative paths are taken from the manifest's directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(file_name))
+    jobs = []
+    with open(file_name, newline='', encoding='utf-8') as csvfile:
+        for row in csv.reader(csvfile):
+            if not row:
+                continue
+            symbol, order_file = row[0].strip(), row[1].strip()
+            jobs.append((symbol, os.path.join(base_dir, order_file)))
+    return jobs
+
+
+def list_order_files(directory):
+    """ One job per order file in a directory, the symbol being the file name without extension.
+    """
+    jobs = []
+    for file_name in sorted(os.listdir(directory)):
+        symbol, extension = os.path.splitext(file_name)
+        if extension.lower() in ('.txt', '.csv', '.bin'):
+            jobs.append((symbol, os.path.join(directory, file_name)))
+    return jobs
+
+
+def run_symbol(job):
+    """ Run the opening auction for one symbol and summarize the residual book.
+    """
+    symbol, order_file = job
+    if order_file.lower().endswith('.bin'):
+        columns = read_order_columns_binary(order_file)
+    else:
+        columns = read_order_columns(order_file)
+    call_auction = CallAuction.from_columns(*columns)
+
+    # without a cross the whole book stays resting
+    call_auction.compute_clearing_price()
+    call_auction.compute_orderbook()
+    return (symbol, call_auction.clearing_price, call_auction.clearing_qty,
+            len(call_auction.residual_bid_prices), call_auction.residual_bid_qtys.sum().item(),
+            len(call_auction.residual_ask_prices), call_auction.residual_ask_qtys.sum().item())
+
+
+def run_auctions(jobs, max_workers=None):
+    """ Run the opening auction for all (symbol, order file) jobs across a process pool.
+    Returns one result row per symbol, in job order, with the fields in RESULT_COLUMNS.
+    """
+    jobs = list(jobs)
+    if max_workers == 1:
+        return [run_symbol(job) for job in jobs]
+
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_symbol, jobs, chunksize=chunksize))
+
+
+def write_results(file_name, results):
+    with open(file_name, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(RESULT_COLUMNS)
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the opening auction for many symbols.')
+    parser.add_argument('orders', help='directory of per-symbol order files or a manifest file')
+    parser.add_argument('--output', default='auction_results.csv', help='consolidated results file')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    args = parser.parse_args()
+
+    if os.path.isdir(args.orders):
+        jobs = list_order_files(args.orders)
+    else:
+        jobs = read_manifest(args.orders)
+    results = run_auctions(jobs, args.workers)
+    write_results(args.output, results)
+    print(f'Ran {len(results)} auctions, results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
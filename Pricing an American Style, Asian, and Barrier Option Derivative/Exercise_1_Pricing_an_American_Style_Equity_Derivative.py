@@ -4,40 +4,119 @@ Created on Thu Mar  5 17:34:51 2020
 
 @author: wenyu
 """
+from collections import namedtuple
+
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.stats as si
 
-def Binomial(n, S, K, r, v, t, PutCall):  
-    At = t/n 
+Greeks = namedtuple('Greeks', ['price', 'delta', 'gamma', 'theta', 'vega', 'rho'])
+
+def _tree_inputs(S, K, r, v, t, PutCall):
+    S, K, r, v, t = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype=float)) for x in (S, K, r, v, t)])
+    signs = np.broadcast_to(np.where(np.asarray(PutCall) == "C", 1.0, -1.0), S.shape)
+    return S, K, r, v, t, signs
+
+
+def _tree_half_width(n, r, v, t, node_step, tail_width):
+    #nodes more than the drift plus tail_width standard deviations of the terminal log price away from the root
+    #are reached with negligible probability and are left out of the tree
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drift = np.abs(r - 0.5*v**2)*t/node_step
+        deviation = np.sqrt(t)*v/node_step
+    half_width = np.max(np.nan_to_num(drift + tail_width*deviation, nan=np.inf))
+    return n if not half_width < n else int(np.ceil(half_width))
+
+
+def binomial_prices(n, S, K, r, v, t, PutCall="C", american=True, tail_width=8.0):
+    """Price a batch of options on an n-step Cox-Ross-Rubinstein tree.
+    S, K, r, v and t broadcast against each other and PutCall is "C", "P" or
+    an array of them, so a whole chain of strikes and expiries is priced at
+    once. Each option keeps a single row of node values that is overwritten
+    step by step, so memory is O(n) per option, and every step of the
+    backward induction is one vectorized update for the whole batch. Nodes
+    further than tail_width standard deviations from the root are left out;
+    the nodes just outside the kept band keep stale values, which are reached
+    with negligible probability.
+    """
+    S, K, r, v, t, signs = _tree_inputs(S, K, r, v, t, PutCall)
+    At = t/n
     u = np.exp(v*np.sqrt(At))
     d = 1./u
-    p = (np.exp(r*At)-d) / (u-d) 
-
-    #Binomial price tree
-    stockvalue = np.zeros((n+1,n+1))
-    stockvalue[0,0] = S
-    for i in range(1,n+1):
-        stockvalue[i,0] = stockvalue[i-1,0]*u
-        for j in range(1,i+1):
-            stockvalue[i,j] = stockvalue[i-1,j-1]*d
-    
-    #option value at final node   
-    optionvalue = np.zeros((n+1,n+1))
-    for j in range(n+1):
-        if PutCall=="C": # Call
-            optionvalue[n,j] = max(0, stockvalue[n,j]-K)
-        elif PutCall=="P": #Put
-            optionvalue[n,j] = max(0, K-stockvalue[n,j])
-    
-    #backward calculation for option price    
-    for i in range(n-1,-1,-1):
-        for j in range(i+1):
-                if PutCall=="P":
-                    optionvalue[i,j] = max(0, K-stockvalue[i,j], np.exp(-r*At)*(p*optionvalue[i+1,j]+(1-p)*optionvalue[i+1,j+1]))
-                elif PutCall=="C":
-                    optionvalue[i,j] = max(0, stockvalue[i,j]-K, np.exp(-r*At)*(p*optionvalue[i+1,j]+(1-p)*optionvalue[i+1,j+1]))
-    return optionvalue[0,0]
+    p = (np.exp(r*At)-d) / (u-d)
+    up_weights = (np.exp(-r*At)*p)[:, None]
+    down_weights = (np.exp(-r*At)*(1-p))[:, None]
+    half_width = _tree_half_width(n, r, v, t, v*np.sqrt(At), tail_width)
+
+    #exercise value at every stock price S*u^k, k = -n..n, split by parity: node j of step i is at k = 2j - i
+    exercise = signs[:, None]*(S[:, None]*np.exp(np.log(u)[:, None]*np.arange(-n, n+1)) - K[:, None])
+    exercise = (np.ascontiguousarray(exercise[:, 0::2]), np.ascontiguousarray(exercise[:, 1::2]))
+
+    def node_range(i):
+        return max(0, (i - half_width + 1)//2), min(i, (i + half_width)//2)
+
+    def exercise_values(i, first, last):
+        offset = (n - i)//2
+        return exercise[(n - i) % 2][:, offset + first:offset + last + 1]
+
+    #option value at final node
+    values = np.zeros((len(S), n+2))
+    values[:, :n+1] = np.maximum(exercise[0], 0)
+    scratch = np.empty_like(values)
+
+    #backward calculation for option price
+    for i in range(n-1, -1, -1):
+        first, last = node_range(i)
+        head = values[:, first:last+1]
+        np.multiply(values[:, first+1:last+2], up_weights, out=scratch[:, first:last+1])
+        head *= down_weights
+        head += scratch[:, first:last+1]
+        if american:
+            np.maximum(head, exercise_values(i, first, last), out=head)
+    return values[:, 0]
+
+
+def trinomial_prices(n, S, K, r, v, t, PutCall="C", american=True, tail_width=8.0):
+    """Price a batch of options on an n-step Boyle trinomial tree, see binomial_prices.
+    """
+    S, K, r, v, t, signs = _tree_inputs(S, K, r, v, t, PutCall)
+    At = t/n
+    u = np.exp(v*np.sqrt(2*At))
+    half_up, half_down = np.exp(v*np.sqrt(At/2)), np.exp(-v*np.sqrt(At/2))
+    pu = ((np.exp(r*At/2)-half_down) / (half_up-half_down))**2
+    pd = ((half_up-np.exp(r*At/2)) / (half_up-half_down))**2
+    up_weights = (np.exp(-r*At)*pu)[:, None]
+    middle_weights = (np.exp(-r*At)*(1-pu-pd))[:, None]
+    down_weights = (np.exp(-r*At)*pd)[:, None]
+    half_width = _tree_half_width(n, r, v, t, v*np.sqrt(2*At), tail_width)
+
+    #exercise value at every stock price S*u^k, k = -n..n; node j of step i is at k = j - i
+    exercise = signs[:, None]*(S[:, None]*np.exp(np.log(u)[:, None]*np.arange(-n, n+1)) - K[:, None])
+
+    def node_range(i):
+        return i - min(i, half_width), i + min(i, half_width)
+
+    def exercise_values(i, first, last):
+        return exercise[:, n - i + first:n - i + last + 1]
+
+    values = np.zeros((len(S), 2*n+3))
+    values[:, :2*n+1] = np.maximum(exercise, 0)
+    scratch = np.empty_like(values)
+
+    for i in range(n-1, -1, -1):
+        first, last = node_range(i)
+        head = values[:, first:last+1]
+        np.multiply(values[:, first+1:last+2], middle_weights, out=scratch[:, first:last+1])
+        scratch[:, first:last+1] += up_weights*values[:, first+2:last+3]
+        head *= down_weights
+        head += scratch[:, first:last+1]
+        if american:
+            np.maximum(head, exercise_values(i, first, last), out=head)
+    return values[:, 0]
+
+
+def Binomial(n, S, K, r, v, t, PutCall):
+    return float(binomial_prices(n, S, K, r, v, t, PutCall)[0])
 
 
 #delta calculation
@@ -119,51 +198,222 @@ def theta(S, K, T, r, sigma, option = 'call'):
     return theta
 
 
+#standard normal cdf and pdf without scipy, Hart's double precision rational approximation
+def norm_cdf(x):
+    x = np.asarray(x, dtype=float)
+    z = np.abs(x)
+    exponential = np.exp(-0.5*z*z)
+    numerator = ((((((0.0352624965998911*z + 0.700383064443688)*z + 6.37396220353165)*z + 33.912866078383)*z
+                   + 112.079291497871)*z + 221.213596169931)*z + 220.206867912376)
+    denominator = (((((((0.0883883476483184*z + 1.75566716318264)*z + 16.064177579207)*z + 86.7807322029461)*z
+                     + 296.564248779674)*z + 637.333633378831)*z + 793.826512519948)*z + 440.413735824752)
+    with np.errstate(invalid='ignore', over='ignore'):
+        continued_fraction = z + 1/(z + 2/(z + 3/(z + 4/(z + 0.65))))
+        tail = np.where(z < 7.07106781186547, exponential*numerator/denominator,
+                        exponential/continued_fraction/2.506628274631)
+    tail = np.where(z > 37, 0.0, tail)
+    return np.where(x > 0, 1 - tail, tail)
+
+
+def norm_pdf(x):
+    return np.exp(-0.5*np.square(x)) / np.sqrt(2*np.pi)
+
+
+def black_scholes_greeks(S, K, T, r, sigma, option='call'):
+    """European Black-Scholes price and Greeks for arrays of options.
+    S, K, T, r, sigma broadcast against each other and option is 'call',
+    'put' or an array of them. d1, d2, the pdf and the cdf are computed once
+    for the whole batch. Theta is per year, vega and rho per unit change of
+    sigma and r. At expiry or with zero volatility the price is the
+    discounted intrinsic value and the Greeks are those of that value.
+    """
+    S, K, T, r, sigma = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (S, K, T, r, sigma)])
+    is_call = np.broadcast_to(np.asarray(option) == 'call', S.shape)
+    sqrt_T = np.sqrt(T)
+    deviation = sigma*sqrt_T
+    discounted_K = K*np.exp(-r*T)
+    log_moneyness = np.log(S/K) + r*T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        random = deviation > 0
+        #without randomness d1 is +-inf on either side of the forward and 0 at the money
+        at_the_money = log_moneyness == 0
+        degenerate_d1 = np.sign(log_moneyness)*np.where(at_the_money, 0.0, np.inf)
+        d1 = np.where(random, (log_moneyness + 0.5*deviation**2) / deviation, degenerate_d1)
+        d2 = np.where(random, d1 - deviation, d1)
+        density = norm_pdf(d1)
+        cdf_d1, cdf_d2 = norm_cdf(d1), norm_cdf(d2)
+        cdf_minus_d1, cdf_minus_d2 = norm_cdf(-d1), norm_cdf(-d2)
+        gamma = np.where(random, density / (S*deviation), 0.0)
+        decay = np.where(random & (T > 0), -sigma*S*density / (2*sqrt_T), 0.0)
+        vega = np.where(random, S*density*sqrt_T, 0.0)
 
-# Inputs for the model
-n = 10 #input("Enter number of binomial steps: ")           #number of steps
-S = 100 #input("Enter the initial underlying asset price: ") #initial underlying asset price
-r = 0.06 #input("Enter the risk-free interest rate: ")        #risk-free interest rate
-K = 105 #input("Enter the option strike price: ")            #strike price
-v = 0.4 #input("Enter the volatility factor: ")              #volatility
-t = 1.
+    #puts on N(-d) directly, 1 - N(d) cancels to rounding noise deep out of the money
+    price = np.where(is_call, S*cdf_d1 - discounted_K*cdf_d2, discounted_K*cdf_minus_d2 - S*cdf_minus_d1)
+    delta = np.where(is_call, cdf_d1, -cdf_minus_d1)
+    theta = np.where(is_call, decay - r*discounted_K*cdf_d2, decay + r*discounted_K*cdf_minus_d2)
+    rho = np.where(is_call, T*discounted_K*cdf_d2, -T*discounted_K*cdf_minus_d2)
+    return Greeks(price, delta, gamma, theta, vega, rho)
+
+
+def implied_volatility(price, S, K, T, r, option='call', american=False, n=200, lower=1e-4, upper=5.0,
+                       tolerance=1e-10, max_iterations=100):
+    """Implied volatilities of arrays of option quotes.
+    European quotes are inverted from Black-Scholes by Halley's method started
+    from the Corrado-Miller approximation. American quotes (american=True)
+    are inverted from the n-step binomial_prices tree by the Illinois variant
+    of regula falsi, every iteration pricing all unsolved quotes in one batch.
+    Both keep a bracket that starts as [lower, upper] and shrinks with every
+    step, and fall back to bisection when a step would leave it. For the tree
+    the bracket starts no lower than 2*r*sqrt(T/n), below which its up
+    probability would exceed one, and a quote equal to the price at the lower
+    end, such as a deep in the money put worth its exercise value, gets the
+    lower end as implied volatility.
+    Returns (vols, converged); quotes outside the prices reachable within
+    [lower, upper] or not solved within max_iterations get nan and False.
+    """
+    price, S, K, T, r = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype=float))
+                                              for x in (price, S, K, T, r)])
+    option = np.broadcast_to(np.asarray(option), price.shape)
+    if american:
+        PutCall = np.where(option == 'call', "C", "P")
+
+        def price_errors(vols, active):
+            prices = binomial_prices(n, S[active], K[active], r[active], vols, T[active], PutCall[active])
+            return prices - price[active]
+    else:
+        def price_errors(vols, active):
+            prices = black_scholes_greeks(S[active], K[active], T[active], r[active], vols, option[active]).price
+            return prices - price[active]
+
+    everything = np.ones(price.shape, dtype=bool)
+    lows, highs = np.full(price.shape, float(lower)), np.full(price.shape, float(upper))
+    if american:
+        lows = np.maximum(lows, 2*np.abs(r)*np.sqrt(T/n))
+    f_lows, f_highs = price_errors(lows, everything), price_errors(highs, everything)
+    bracketed = (f_lows <= 0) & (f_highs >= 0)
+    vols = np.where(f_lows == 0, lows, np.nan)
+    converged = ~bracketed | (f_lows == 0)
+    if american:
+        _solve_illinois(price_errors, vols, lows, highs, f_lows, f_highs, converged, tolerance, max_iterations)
+    else:
+        _solve_halley(price, S, K, T, r, option, vols, lows, highs, converged, tolerance, max_iterations)
+    converged &= bracketed
+    return np.where(converged, vols, np.nan), converged
+
+
+def _solve_halley(price, S, K, T, r, option, vols, lows, highs, converged, tolerance, max_iterations):
+    #Corrado-Miller initial guess on the equivalent call price
+    discounted_K = K*np.exp(-r*T)
+    call_price = np.where(option == 'call', price, price + S - discounted_K)
+    excess = call_price - (S - discounted_K)/2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        guess = np.sqrt(2*np.pi/T) / (S + discounted_K) * (excess + np.sqrt(excess**2 - (S - discounted_K)**2/np.pi))
+    inside = np.isfinite(guess) & (guess > lows) & (guess < highs)
+    vols[~converged] = np.where(inside, guess, (lows + highs)/2)[~converged]
+
+    for _ in range(max_iterations):
+        active = ~converged
+        if not active.any():
+            break
+        vol, low, high = vols[active], lows[active], highs[active]
+        s, k, t, rate = S[active], K[active], T[active], r[active]
+        greeks = black_scholes_greeks(s, k, t, rate, vol, option[active])
+        errors = greeks.price - price[active]
+        low = np.where(errors < 0, vol, low)
+        high = np.where(errors < 0, high, vol)
+
+        #Halley step with vomma = vega * d1 * d2 / sigma
+        deviation = vol*np.sqrt(t)
+        d1 = (np.log(s/k) + (rate + 0.5*vol**2)*t) / deviation
+        vomma = greeks.vega*d1*(d1 - deviation) / vol
+        with np.errstate(divide='ignore', invalid='ignore'):
+            steps = vol - 2*errors*greeks.vega / (2*greeks.vega**2 - errors*vomma)
+        outside = ~np.isfinite(steps) | (steps <= low) | (steps >= high)
+        steps = np.where(outside, (low + high)/2, steps)
+
+        done = (np.abs(errors) <= tolerance) | (np.abs(steps - vol) <= tolerance*np.maximum(1, vol))
+        vols[active] = np.where(np.abs(errors) <= tolerance, vol, steps)
+        lows[active], highs[active] = low, high
+        converged[active] = done
+
+
+def _solve_illinois(price_errors, vols, lows, highs, f_lows, f_highs, converged, tolerance, max_iterations):
+    side = np.zeros(vols.shape, dtype=int)
+    for _ in range(max_iterations):
+        active = ~converged
+        if not active.any():
+            break
+        low, high, f_low, f_high = lows[active], highs[active], f_lows[active], f_highs[active]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vol = (low*f_high - high*f_low) / (f_high - f_low)
+        vol = np.where(np.isfinite(vol) & (vol > low) & (vol < high), vol, (low + high)/2)
+        errors = price_errors(vol, active)
+
+        #replace the end with the same sign; halve the other end's error when the same end is kept twice in a row
+        below = errors < 0
+        last_side = side[active]
+        f_high = np.where(below & (last_side == -1), f_high/2, f_high)
+        f_low = np.where(~below & (last_side == 1), f_low/2, f_low)
+        low, f_low = np.where(below, vol, low), np.where(below, errors, f_low)
+        high, f_high = np.where(below, high, vol), np.where(below, f_high, errors)
+
+        done = (np.abs(errors) <= tolerance) | (high - low <= tolerance*np.maximum(1, vol))
+        vols[active] = vol
+        lows[active], highs[active], f_lows[active], f_highs[active] = low, high, f_low, f_high
+        side[active] = np.where(below, -1, 1)
+        converged[active] = done
+
+
+def main():
+    # Inputs for the model
+    n = 10 #input("Enter number of binomial steps: ")           #number of steps
+    S = 100 #input("Enter the initial underlying asset price: ") #initial underlying asset price
+    r = 0.06 #input("Enter the risk-free interest rate: ")        #risk-free interest rate
+    K = 105 #input("Enter the option strike price: ")            #strike price
+    v = 0.4 #input("Enter the volatility factor: ")              #volatility
+    t = 1.
 
     #Graphs and results for the Option prices
 
-y = [-Binomial(n, S, K, r, v, t, "C")] * (K)
-y += [x - Binomial(n, S, K, r, v, t, "C") for x in range(K)] 
-
-plt.plot(range(2*K), y)
-plt.axis([0, 2*K, min(y) - 10, max(y) + 10])
-plt.xlabel('Underlying asset price')
-plt.ylabel('Profits')
-plt.axvline(x=K, linestyle='--', color='black')
-plt.axhline(y=0, linestyle=':', color='black')
-plt.title('American Call Option')
-plt.text(105, 0, 'K')
-plt.show()
-
-print ("American Call Price: %s" %(Binomial(n, S, K, r, v, t, PutCall="C")))
-print ("Call option delta: %s" %(delta(S, K, t, r, v, option = 'call')))
-print ("Option gamma: %s" %(gamma(S, K, t, r, v)))
-print ("Call option theta: %s" %(theta(S, K, t, r, v, option = 'call')))
-
-
-
-z = [-x + K - Binomial(n, S, K, r, v, t, "P") for x in range(K)] 
-z += [-Binomial(n, S, K, r, v, t, "P")] * (K)
-
-plt.plot(range(2*K), z, color='red')
-plt.axis([0, 2*K, min(y) - 10, max(y) + 10])
-plt.xlabel('Underlying asset price')
-plt.ylabel('Profits')
-plt.axvline(x=K, linestyle='--', color='black')
-plt.axhline(y=0, linestyle=':', color='black')
-plt.title('American Put Option')
-plt.text(105, 0, 'K')
-plt.show()
-
-print ("American Put Price: %s" %(Binomial(n, S, K, r, v, t, PutCall="P")))
-print ("Call option delta: %s" %(delta(S, K, t, r, v, option = 'put')))
-print ("Option gamma: %s" %(gamma(S, K, t, r, v)))
-print ("Call option theta: %s" %(theta(S, K, t, r, v, option = 'put')))
\ No newline at end of file
+    y = [-Binomial(n, S, K, r, v, t, "C")] * (K)
+    y += [x - Binomial(n, S, K, r, v, t, "C") for x in range(K)] 
+
+    plt.plot(range(2*K), y)
+    plt.axis([0, 2*K, min(y) - 10, max(y) + 10])
+    plt.xlabel('Underlying asset price')
+    plt.ylabel('Profits')
+    plt.axvline(x=K, linestyle='--', color='black')
+    plt.axhline(y=0, linestyle=':', color='black')
+    plt.title('American Call Option')
+    plt.text(105, 0, 'K')
+    plt.show()
+
+    print ("American Call Price: %s" %(Binomial(n, S, K, r, v, t, PutCall="C")))
+    print ("Call option delta: %s" %(delta(S, K, t, r, v, option = 'call')))
+    print ("Option gamma: %s" %(gamma(S, K, t, r, v)))
+    print ("Call option theta: %s" %(theta(S, K, t, r, v, option = 'call')))
+
+
+
+    z = [-x + K - Binomial(n, S, K, r, v, t, "P") for x in range(K)] 
+    z += [-Binomial(n, S, K, r, v, t, "P")] * (K)
+
+    plt.plot(range(2*K), z, color='red')
+    plt.axis([0, 2*K, min(y) - 10, max(y) + 10])
+    plt.xlabel('Underlying asset price')
+    plt.ylabel('Profits')
+    plt.axvline(x=K, linestyle='--', color='black')
+    plt.axhline(y=0, linestyle=':', color='black')
+    plt.title('American Put Option')
+    plt.text(105, 0, 'K')
+    plt.show()
+
+    print ("American Put Price: %s" %(Binomial(n, S, K, r, v, t, PutCall="P")))
+    print ("Call option delta: %s" %(delta(S, K, t, r, v, option = 'put')))
+    print ("Option gamma: %s" %(gamma(S, K, t, r, v)))
+    print ("Call option theta: %s" %(theta(S, K, t, r, v, option = 'put')))
+
+
+if __name__ == "__main__":
+    main()
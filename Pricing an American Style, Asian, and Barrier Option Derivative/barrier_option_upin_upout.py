@@ -1,13 +1,6 @@
-import matplotlib.pyplot as plt
 import numpy as np
-from random import gauss
-from math import exp, sqrt
 
-
-class Configuration:
-    def __init__(self, number_of_simulations, number_of_timesteps):
-        self.number_of_simulations = number_of_simulations
-        self.number_of_timesteps = number_of_timesteps
+from monte_carlo import Configuration, GbmModel, MonteCarloEngineSimulator
 
 
 class OptionTrade:
@@ -24,22 +17,6 @@ class OptionTrade:
         self.delta_t = self.time_to_maturity/self.number_of_timesteps
 
 
-class GbmModel:
-    def __init__(self, configuration):
-        self.configuration = configuration
-
-    def simulate(self, trade):
-        prices = [(0.0, trade.underlying)]
-        timestep = trade.time_to_maturity / self.configuration.number_of_timesteps
-        times = np.linspace(timestep, trade.time_to_maturity, self.configuration.number_of_timesteps)
-        for time in times:
-            drift = (trade.risk_free_rate - 0.5 * (trade.volatility ** 2.0)) * timestep
-            diffusion = trade.volatility * np.sqrt(timestep) * np.random.normal(0, 1)
-            price = prices[-1][1] * np.exp(drift + diffusion)
-            prices.append((time, price))
-        return prices
-
-
 class OptionTradePayoffPricer:
     def __init__(self, underlying, strike, risk_free_rate, volatility, time_to_maturity, barrier, number_of_simulations, number_of_timesteps, option_type='upin'):
         self.underlying = underlying
@@ -53,117 +30,46 @@ class OptionTradePayoffPricer:
         self.number_of_timesteps = number_of_timesteps
         self.delta_t = self.time_to_maturity/self.number_of_timesteps
 
-    def calculate_price(self, trade, payoff_prices_per_simulation):
-        if trade.option_type == 'upin':
-            return self.__calculate_call_price(trade, payoff_prices_per_simulation)
-        elif trade.option_type == 'upout':
-            return self.__calculate_put_price(trade, payoff_prices_per_simulation)
-        
-    def call_payoff(self,s):
+    def call_payoff(self, s):
         """use to price a call"""
-        self.cp = max(s - self.strike, 0.0)
-        return self.cp
-
-    def __calculate_call_price(self, trade, payoff_prices_per_simulation):
-        payoffs = []
-        
-        for i in range(0, self.number_of_simulations):
-            self.stock_path = []
-            self.S_j = self.underlying
-            for j in range(0, int(self.number_of_timesteps - 1)):
-                self.xi = gauss(0,1.0)
-    
-                self.S_j *= (exp((self.risk_free_rate - .5*self.volatility * self.volatility) * self.delta_t + self.volatility *sqrt(self.delta_t) * self.xi))
-    
-                self.stock_path.append(self.S_j)
-            if max(self.stock_path) > self.barrier:
-                payoffs.append(self.call_payoff(self.stock_path[-1]))
-            elif max(self.stock_path) < self.barrier:
-                payoffs.append(0)
-        discount_rate = np.exp(-1.0 * trade.risk_free_rate * trade.time_to_maturity)
-        np_payoffs = np.array(payoffs, dtype=float) 
-        np_Vi = discount_rate*np_payoffs 
-        payoff = np.average(np_Vi)
-        return payoff
+        return np.maximum(s - self.strike, 0.0)
 
+    def calculate_payoffs(self, trade, paths):
+        """ Discounted call payoffs of a block of paths, the barrier being
+        monitored at every timestep after the spot.
+        """
+        knocked_in = paths[:, 1:].max(axis=1) > self.barrier
+        if trade.option_type == 'upin':
+            alive = knocked_in
+        elif trade.option_type == 'upout':
+            alive = ~knocked_in
+        else:
+            raise ValueError(f'Unknown option type {trade.option_type}')
 
-    def __calculate_put_price(self, trade, payoff_prices_per_simulation):
-        payoffs = []
-        
-        for i in range(0, self.number_of_simulations):
-            self.stock_path = []
-            self.S_j = self.underlying
-            for j in range(0, int(self.number_of_timesteps - 1)):
-                self.xi = gauss(0,1.0)
-    
-                self.S_j *= (exp((self.risk_free_rate - .5*self.volatility * self.volatility) * self.delta_t + self.volatility *sqrt(self.delta_t) * self.xi))
-    
-                self.stock_path.append(self.S_j)
-            if max(self.stock_path) > self.barrier:
-                payoffs.append(0)
-            elif max(self.stock_path) < self.barrier:
-                payoffs.append(self.call_payoff(self.stock_path[-1]))
         discount_rate = np.exp(-1.0 * trade.risk_free_rate * trade.time_to_maturity)
-        np_payoffs = np.array(payoffs, dtype=float) 
-        np_Vi = discount_rate*np_payoffs 
-        payoff = np.average(np_Vi)
-        return payoff
-
-
-class MonteCarloEngineSimulator:
-    # class level attributes
-    times, paths = [], []
-
-    def __init__(self, configuration, model):
-        self.configuration = configuration
-        self.model = model
-
-    def simulate(self, trade, trade_pricer):
-        payoff_prices_per_simulation = []
-        for simulation_index in range(self.configuration.number_of_simulations):
-            prices_per_simulation = self.model.simulate(trade)
-            payoff_prices_per_simulation.append(prices_per_simulation[-1][1])
-            MonteCarloEngineSimulator.add_simulation_path(prices_per_simulation, trade)
-        MonteCarloEngineSimulator.plot_simulation_paths(trade)
-        return trade_pricer.calculate_price(trade, payoff_prices_per_simulation)
-
-    @staticmethod
-    def add_simulation_path(prices_per_simulation, trade):
-        x, y = [], []
-        for price_per_simulation in prices_per_simulation:
-            x.append(price_per_simulation[0])
-            y.append(price_per_simulation[1])
-
-        MonteCarloEngineSimulator.times.append(x)
-        MonteCarloEngineSimulator.paths.append(y)
+        return discount_rate * np.where(alive, self.call_payoff(paths[:, -1].astype(np.float64)), 0.0)
 
-    @staticmethod
-    def plot_simulation_paths(trade):
-        for index in range(len(MonteCarloEngineSimulator.times)):
-            plt.plot(MonteCarloEngineSimulator.times[index], MonteCarloEngineSimulator.paths[index])
-        strike_line_x = [0.0, trade.time_to_maturity]
-        strike_line_y = [trade.strike, trade.strike]
-        plt.plot(strike_line_x, strike_line_y, 'k-' )
-        plt.ylabel('Underlying')
-        plt.xlabel('Timestep')
-        plt.show()
+    def calculate_price(self, trade, paths):
+        return np.mean(self.calculate_payoffs(trade, paths))
 
 
 def main():
-    configuration = Configuration(1000, 252)
+    configuration = Configuration(1000, 252, number_of_sample_paths=100)
     trade = OptionTrade(90, 100, 0.05, 0.25, 1, 105, 1000, 252, 'upin')
     model = GbmModel(configuration)
     trade_pricer = OptionTradePayoffPricer(90, 100, 0.05, 0.25, 1, 105, 1000, 252, 'C')
     simulator = MonteCarloEngineSimulator(configuration, model)
     price = simulator.simulate(trade, trade_pricer)
-    print(f'Call Price up-and-in: {price:10.4e}')
+    print(f'Call Price up-and-in: {price:10.4e} +/- {simulator.statistics.standard_error:.1e}')
+    simulator.plot_simulation_paths(trade)
 
     trade = OptionTrade(90, 100, 0.05, 0.25, 1, 105, 1000, 252, 'upout')
     model = GbmModel(configuration)
     trade_pricer = OptionTradePayoffPricer(90, 100, 0.05, 0.25, 1, 105, 1000, 252, 'P')
     simulator = MonteCarloEngineSimulator(configuration, model)
     price = simulator.simulate(trade, trade_pricer)
-    print(f'Call Price up-and-out: {price:10.4e}')
+    print(f'Call Price up-and-out: {price:10.4e} +/- {simulator.statistics.standard_error:.1e}')
+    simulator.plot_simulation_paths(trade)
 
 
 if __name__ == '__main__':
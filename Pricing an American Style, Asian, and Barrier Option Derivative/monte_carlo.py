@@ -0,0 +1,153 @@
+"""
+Monte Carlo engine shared by the Asian and barrier option scripts.
+
+GbmModel generates blocks of risk-neutral price paths and
+MonteCarloEngineSimulator streams them through a pricer's per-path payoffs,
+calculate_payoffs(trade, paths), into RunningStatistics.
+"""
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+class Configuration:
+    def __init__(self, number_of_simulations, number_of_timesteps, seed=None, block_size=10000, dtype=np.float64,
+                 target_standard_error=None, number_of_sample_paths=0):
+        self.number_of_simulations = number_of_simulations
+        self.number_of_timesteps = number_of_timesteps
+        self.seed = seed
+        self.block_size = block_size
+        self.dtype = dtype
+        self.target_standard_error = target_standard_error
+        self.number_of_sample_paths = number_of_sample_paths
+
+
+class GbmModel:
+    """ Geometric Brownian motion under the risk-neutral measure.
+    Paths are generated in blocks of up to configuration.block_size paths as
+    (paths x timesteps + 1) arrays of configuration.dtype, the first column
+    being the spot. Blocks are column-major, so the timesteps after the spot
+    are one contiguous region that a seeded numpy.random.Generator fills with
+    exactly one normal per path and step. They are turned into prices in
+    place by a cumulative sum of log increments and one exponential, so there
+    is no per-step Python loop and no temporary the size of a block.
+    """
+    def __init__(self, configuration):
+        self.configuration = configuration
+        self.generator = np.random.default_rng(configuration.seed)
+
+    def times(self, trade):
+        return np.linspace(0.0, trade.time_to_maturity, self.configuration.number_of_timesteps + 1)
+
+    def simulate_paths(self, trade, number_of_paths):
+        """ Yield number_of_paths price paths in blocks.
+        """
+        timesteps = self.configuration.number_of_timesteps
+        dtype = self.configuration.dtype
+        timestep = trade.time_to_maturity / timesteps
+        drift = (trade.risk_free_rate - 0.5 * (trade.volatility ** 2.0)) * timestep
+        diffusion = trade.volatility * np.sqrt(timestep)
+        for first_path in range(0, number_of_paths, self.configuration.block_size):
+            block_size = min(self.configuration.block_size, number_of_paths - first_path)
+            prices = np.empty((block_size, timesteps + 1), dtype=dtype, order='F')
+            prices[:, 0] = 0.0
+            log_returns = prices[:, 1:]
+            self.generator.standard_normal(dtype=dtype, out=log_returns)
+            log_returns *= diffusion
+            log_returns += drift
+            np.cumsum(prices, axis=1, out=prices)
+            np.exp(prices, out=prices)
+            prices *= trade.underlying
+            yield prices
+
+    def simulate(self, trade):
+        """ One path as a list of (time, price).
+        """
+        prices = next(self.simulate_paths(trade, 1))[0]
+        return list(zip(self.times(trade).tolist(), prices.tolist()))
+
+
+class RunningStatistics:
+    """ Mean and variance of a stream of samples folded in one chunk at a
+    time with the pairwise update of Chan, Golub and LeVeque, so memory does
+    not grow with the number of samples. Accumulates in float64 whatever
+    the dtype of the samples.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.sum_of_squared_deviations = 0.0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        count = len(values)
+        if count == 0:
+            return
+        mean = values.mean()
+        total = self.count + count
+        delta = mean - self.mean
+        self.sum_of_squared_deviations += (np.square(values - mean).sum() +
+                                           delta * delta * self.count * count / total)
+        self.mean += delta * count / total
+        self.count = total
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return np.nan
+        return self.sum_of_squared_deviations / (self.count - 1)
+
+    @property
+    def standard_error(self):
+        if self.count < 2:
+            return np.inf
+        return np.sqrt(self.variance / self.count)
+
+    def confidence_interval(self, z=1.96):
+        """ Normal confidence interval of the mean, 95% for the default z.
+        """
+        half_width = z * self.standard_error
+        return self.mean - half_width, self.mean + half_width
+
+
+class MonteCarloEngineSimulator:
+    """ Streams blocks of paths from the model through the pricer's payoffs.
+    Each block's payoffs are folded into RunningStatistics and the block is
+    dropped, so memory is bounded by one block of configuration.block_size
+    paths. Simulation stops after configuration.number_of_simulations paths,
+    or at the end of the first block that brings the standard error down to
+    configuration.target_standard_error. The first
+    configuration.number_of_sample_paths paths are kept for plotting; paths
+    are independent draws, so they are a random sample of all of them.
+    """
+    def __init__(self, configuration, model):
+        self.configuration = configuration
+        self.model = model
+        self.statistics = None
+        self.times = None
+        self.sample_paths = None
+
+    def simulate(self, trade, trade_pricer):
+        self.statistics = RunningStatistics()
+        self.times = self.model.times(trade)
+        sample_size = self.configuration.number_of_sample_paths
+        sample_paths = []
+        target_standard_error = self.configuration.target_standard_error
+        for paths in self.model.simulate_paths(trade, self.configuration.number_of_simulations):
+            self.statistics.update(trade_pricer.calculate_payoffs(trade, paths))
+            if sample_size > 0:
+                sample_paths.append(paths[:sample_size].copy())
+                sample_size -= len(sample_paths[-1])
+            if target_standard_error is not None and self.statistics.standard_error <= target_standard_error:
+                break
+        self.sample_paths = np.concatenate(sample_paths) if sample_paths else np.empty((0, len(self.times)))
+        return self.statistics.mean
+
+    def plot_simulation_paths(self, trade):
+        plt.plot(self.times, self.sample_paths.T)
+        strike_line_x = [0.0, trade.time_to_maturity]
+        strike_line_y = [trade.strike, trade.strike]
+        plt.plot(strike_line_x, strike_line_y, 'k-' )
+        plt.ylabel('Underlying')
+        plt.xlabel('Timestep')
+        plt.show()
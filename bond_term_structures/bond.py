@@ -1,15 +1,17 @@
 import math
 
+import numpy as np
+
 
 class Bond(object):
 
-    def __init__(self, name, coupon, issue_date, maturity_date, compounding_frequency):
+    def __init__(self, name, coupon, issue_date, maturity_date, compounding_frequency, count_coupon_payments=1):
         self._name = name
         self._coupon = coupon
         self._issue_date = issue_date
         self._maturity_date = maturity_date
         self._compounding_frequency = compounding_frequency
-        self._count_coupon_payments = 1
+        self._count_coupon_payments = count_coupon_payments
 
         self._price = 0.0
         self._face_value = 1000.0
@@ -32,9 +34,20 @@ class Bond(object):
     def get_compounding_frequency(self):
         return self._compounding_frequency
 
+    def get_count_coupon_payments(self):
+        return self._count_coupon_payments
+
+    def get_time_to_maturity(self):
+        """ Time to maturity in years, count of coupon periods over the compounding frequency.
+        """
+        return self._count_coupon_payments / self._compounding_frequency
+
     def get_price(self):
         return self._price
 
+    def get_face_value(self):
+        return self._face_value
+
     def set_price(self, price, face_value=1000.0):
         self._price = price
         self._face_value = face_value
@@ -43,143 +56,94 @@ class Bond(object):
     def compute_price(face_value, coupon, ytm, count_coupon_payments): #preparation for bisection method
         price = 0.0
         for i in range(count_coupon_payments):
-            price += 0
+            price += coupon * face_value / math.pow(1.0 + ytm, i + 1) #PV of coupon payments
         price += face_value / math.pow(1.0 + ytm, count_coupon_payments) #PV of principal payment
         return price
 
     def compute_ytm(self):
-        """ Computes the bond yield-to-maturity via bisection method
+        """ Computes the bond yield-to-maturity
         :return: yield to maturity
         """
-        ytm, tolerance = 0.0, 0.0001
-        a, b, c = 0.0, 100.0, 0.0
-
-        while True:
-            fa = self.compute_price(self._face_value, self._coupon / 100.0 / self._compounding_frequency,
-                                    a / 100.0 / self._compounding_frequency, self._count_coupon_payments) \
-                 - self._price / 100.0 * self._face_value
-            fb = self.compute_price(self._face_value, self._coupon / 100.0 / self._compounding_frequency,
-                                    b / 100.0 / self._compounding_frequency, self._count_coupon_payments) \
-                 - self._price / 100.0 * self._face_value
-
-            if math.fabs(fa) <= tolerance:
-                ytm = a
-                break
-            elif math.fabs(fb) <= tolerance:
-                ytm = b
-                break
-            elif fa * fb < 0.0:
-                c = (a + b) / 2.0
-                fc = self.compute_price(self._face_value,
-                                        self._coupon / 100.0 / self._compounding_frequency,
-                                        c / 100.0 / self._compounding_frequency,
-                                        self._count_coupon_payments) - self._price / 100.0 * self._face_value
-                if math.fabs(fc) <= tolerance:
-                    ytm = c
-                    break
-                if fa * fc < 0.0:
-                    b = c
-                else:
-                    a = c
-            else:
-                print("Problem:  Lower and upper bounds of the starting range does not have a root.")
-                return -1.0
-        return ytm
-
-    def bootstrap_spot_rate(self, spot_rates, index_tenor_start, index_tenor_end):
-        ytm, tolerance = 0.0, 0.0001
-        a, b, c = 0.0, 100.0, 0.0
-
-        # setup working spot rates
-        spot_rates_a, spot_rates_b, spot_rates_c = [], [], []
-        for i in range(index_tenor_end + 1):
-            spot_rates_a.append(0.0)
-            spot_rates_b.append(0.0)
-            spot_rates_c.append(0.0)
-
-        while True:
-            # copy known spot rates to working spot rates
-            for i in range(index_tenor_start + 1):
-                spot_rates_a[i] = spot_rates[i]
-                spot_rates_b[i] = spot_rates[i]
-
-            # set starting spot rates
-            for i in range(index_tenor_start + 1, index_tenor_end + 1):
-                spot_rates_a[i] = spot_rates[index_tenor_start] + \
-                                  (a - spot_rates[index_tenor_start]) * (i - index_tenor_start) / \
-                                  (index_tenor_end - index_tenor_start)
-                spot_rates_b[i] = spot_rates[index_tenor_start] + \
-                                  (b - spot_rates[index_tenor_start]) * (i - index_tenor_start) / \
-                                  (index_tenor_end - index_tenor_start)
-
-            for i in range(index_tenor_end + 1):
-                spot_rates_a[i] = spot_rates_a[i] / 100.0 / self._compounding_frequency
-                spot_rates_b[i] = spot_rates_b[i] / 100.0 / self._compounding_frequency
-
-            fa = self.compute_price_from_spot(self._face_value,
-                                              self._coupon / 100.0 / self._compounding_frequency,
-                                              spot_rates_a,
-                                              self._count_coupon_payments) - self._price / 100.0 * self._face_value
-            fb = self.compute_price_from_spot(self._face_value,
-                                              self._coupon / 100.0 / self._compounding_frequency,
-                                              spot_rates_b,
-                                              self._count_coupon_payments) - self._price / 100.0 * self._face_value
-
-            if math.fabs(fa) <= tolerance:
-                for i in range(index_tenor_start + 1, index_tenor_end + 1):
-                    spot_rates[i] = spot_rates[index_tenor_start] + (a - spot_rates[index_tenor_start]) * \
-                                    (i - index_tenor_start) / (index_tenor_end - index_tenor_start)
-                break
-
-            elif math.fabs(fb) <= tolerance:
-                for i in range(index_tenor_start + 1, index_tenor_end + 1):
-                    spot_rates[i] = spot_rates[index_tenor_start] + (b - spot_rates[index_tenor_start]) * \
-                                    (i - index_tenor_start) / (index_tenor_end - index_tenor_start)
-                break
-
-            elif fa * fb < 0.0:
-                c = (a + b) / 2.0
-
-                for i in range(index_tenor_start + 1):
-                    spot_rates_c[i] = spot_rates[i]
-
-                for i in range(index_tenor_start + 1, index_tenor_end + 1):
-                    spot_rates_c[i] = spot_rates[index_tenor_start] + (
-                            c - spot_rates[index_tenor_start]) * \
-                                      (i - index_tenor_start) / (
-                                              index_tenor_end - index_tenor_start)
-
-                for i in range(index_tenor_end + 1):
-                    spot_rates_c[i] = spot_rates_c[i] / 100.0 / self._compounding_frequency
-
-                fc = self.compute_price_from_spot(self._face_value,
-                                                  self._coupon / 100.0 / self._compounding_frequency,
-                                                  spot_rates_c,
-                                                  self._count_coupon_payments) \
-                     - self._price / 100.0 * self._face_value
-
-                if math.fabs(fc) <= tolerance:
-                    for i in range(index_tenor_start + 1, index_tenor_end + 1):
-                        spot_rates[i] = spot_rates[index_tenor_start] + \
-                                        (c - spot_rates[index_tenor_start]) * (i - index_tenor_start) / \
-                                        (index_tenor_end - index_tenor_start)
-                    break
-
-                if fa * fc < 0.0:
-                    b = c
-                else:
-                    a = c
-
-            else:
-                print("Problem:  Lower and upper bounds of the starting range does not have a root.")
-                return -1.0
-
-        return ytm
-
-    @staticmethod
-    def compute_price_from_spot(face_value, coupon, spot_rates, count_coupon_payments):
-        price = 0.0
-        for i in range(count_coupon_payments):
-            price += 0 * face_value / math.pow(1.0 + spot_rates[i], i + 1)
-        price += face_value / math.pow(1.0 + spot_rates[i], count_coupon_payments)
-        return price
+        ytms, converged = compute_ytms([self._price], [self._coupon], [self._compounding_frequency],
+                                       [self._count_coupon_payments])
+        if not converged[0]:
+            print("Problem:  Lower and upper bounds of the starting range does not have a root.")
+            return -1.0
+        return ytms[0]
+
+
+def compute_prices(coupons, ytms, count_coupon_payments):
+    """ Vectorized bond prices per unit of face value, coupons included.
+    coupons and ytms are per compounding period, e.g. 0.025 for 5% paid twice a year.
+    :return: (prices, derivatives of the prices with respect to the per-period ytm)
+    """
+    coupons, ytms = np.asarray(coupons, dtype=float), np.asarray(ytms, dtype=float)
+    counts = np.asarray(count_coupon_payments, dtype=float)
+    growth = 1.0 + ytms
+    principal = growth ** -counts
+
+    # annuity factor sum((1 + y)^-i, i = 1..n) and its derivative, with their series near y = 0
+    near_zero = np.abs(ytms) < 1e-6
+    safe_ytms = np.where(near_zero, 1.0, ytms)
+    annuity = np.where(near_zero, counts - counts * (counts + 1.0) / 2.0 * ytms,
+                       (1.0 - principal) / safe_ytms)
+    annuity_slope = np.where(near_zero,
+                             -counts * (counts + 1.0) / 2.0 + counts * (counts + 1.0) * (counts + 2.0) / 3.0 * ytms,
+                             (counts * safe_ytms * principal / growth - 1.0 + principal) / safe_ytms ** 2)
+
+    prices = coupons * annuity + principal
+    slopes = coupons * annuity_slope - counts * principal / growth
+    return prices, slopes
+
+
+def compute_ytms(prices, coupons, compounding_frequencies, count_coupon_payments,
+                 lower=0.0, upper=100.0, tolerance=1e-12, max_iterations=100):
+    """ Solve the yield-to-maturity of many bonds at once.
+    Inputs are arrays in the units used by Bond: prices per 100 of face value,
+    annual coupons and yields in percent. Every bond is solved by Newton's
+    method on its full coupon cash flows, kept inside a bracket that starts as
+    [lower, upper] and shrinks with every step; a step that would leave the
+    bracket is replaced by bisection.
+    :return: (ytms, converged) where ytms holds annual yields in percent, NaN where
+             the solve failed, and converged flags the bonds that were solved
+    """
+    prices = np.asarray(prices, dtype=float)
+    frequencies = np.broadcast_to(np.asarray(compounding_frequencies, dtype=float), prices.shape)
+    counts = np.broadcast_to(np.asarray(count_coupon_payments, dtype=float), prices.shape)
+    coupons = np.broadcast_to(np.asarray(coupons, dtype=float), prices.shape) / 100.0 / frequencies
+    targets = prices / 100.0
+
+    # bracket per bond in per-period yields; the price falls as the yield rises
+    lows = np.full(prices.shape, lower) / 100.0 / frequencies
+    highs = np.full(prices.shape, upper) / 100.0 / frequencies
+    f_lows = compute_prices(coupons, lows, counts)[0] - targets
+    f_highs = compute_prices(coupons, highs, counts)[0] - targets
+    bracketed = (f_lows >= 0.0) & (f_highs <= 0.0)
+
+    # start from the usual current-yield approximation
+    ytms = (coupons + (1.0 - targets) / np.maximum(counts, 1.0)) / ((1.0 + targets) / 2.0)
+    ytms = np.where((ytms > lows) & (ytms < highs), ytms, (lows + highs) / 2.0)
+
+    converged = ~bracketed
+    for _ in range(max_iterations):
+        active = ~converged
+        if not active.any():
+            break
+        values, slopes = compute_prices(coupons[active], ytms[active], counts[active])
+        errors = values - targets[active]
+        y, low, high = ytms[active], lows[active], highs[active]
+        low = np.where(errors > 0.0, y, low)
+        high = np.where(errors > 0.0, high, y)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            steps = y - errors / slopes
+        outside = ~np.isfinite(steps) | (steps <= low) | (steps >= high)
+        steps = np.where(outside, (low + high) / 2.0, steps)
+
+        done = (np.abs(errors) <= tolerance) | (np.abs(steps - y) <= tolerance * np.maximum(1.0, np.abs(y)))
+        ytms[active] = np.where(np.abs(errors) <= tolerance, y, steps)
+        lows[active], highs[active] = low, high
+        converged[active] = done
+
+    converged &= bracketed
+    return np.where(converged, ytms * frequencies * 100.0, np.nan), converged
@@ -35,15 +35,12 @@ def main():
         tenors_from_bonds.append(bond.get_tenor_in_months())
         ytm_from_bonds.append(bond.compute_ytm())
     
-    # compute term structure (spot and forward rates) and discount factors
+    # term structure (spot and forward rates) and discount factors are solved when first read
     term_structure = TermStructure()
     term_structure.set_bonds(bonds)
-    term_structure.compute_spot_rates()
-    term_structure.compute_discount_factors()
-    term_structure.compute_forward_1m_rates()
 
-    tenor_count = 9
-    ts_tenors = [(i + 1) for i in range(tenor_count)]
+    tenor_count = len(term_structure.tenors)
+    ts_tenors = [term_structure.get_tenor(i) * 12.0 for i in range(tenor_count)]
     ts_spot_rates, ts_forward_1m_rates, ts_discount_factors = [], [], []
     for i in range(tenor_count):
         ts_spot_rates.append(term_structure.get_spot_rate(i))
@@ -51,13 +48,13 @@ def main():
         ts_discount_factors.append(term_structure.get_discount_factor(i))
 
     print(f'Name\tCoupon\tIssueDate\tMaturityDate\tPrice\t\tYTM')
-    for bond in bonds:
+    for bond, ytm in zip(bonds, ytm_from_bonds):
         print(f'{bond.get_name()}\t{bond.get_coupon():10.4f}' +
               f'\t{bond.get_issue_date()}\t{bond.get_maturity_date()}' +
-              f'\t{bond.get_price():10.4f}\t{bond.compute_ytm():10.4f}')
+              f'\t{bond.get_price():10.4f}\t{ytm:10.4f}')
     print(f'Tenor\tSpot Rate\tDiscount Factor\tForward 1m Rate\tForward 3m Rate\tForward 6m Rate')
-    for i in range(9):
-        tenor = (i + 1)
+    for i in range(tenor_count):
+        tenor = ts_tenors[i]
         print(f'{tenor:4.1f}m\t{term_structure.get_spot_rate(i):10.4f}' +
               f'\t{term_structure.get_discount_factor(i):10.4f}\t{term_structure.get_forward_1m_rate(i):10.4f}\t{term_structure.get_forward_3m_rate(i):10.4f}\t{term_structure.get_forward_6m_rate(i):10.4f}')
 
@@ -85,4 +82,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()\
+    main()
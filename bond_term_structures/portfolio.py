@@ -0,0 +1,90 @@
+from collections import namedtuple
+
+import numpy as np
+
+PortfolioRisk = namedtuple('PortfolioRisk', ['pvs', 'dv01s', 'pv', 'dv01', 'key_rate_dv01s', 'key_rate_durations'])
+
+
+class BondPortfolio(object):
+    """ Positions in fixed coupon bonds priced together against a TermStructure.
+    The cash flows of all positions are laid out once in flat arrays, so
+    pricing is one pass of array operations over every cash flow however many
+    positions there are, and the same layout is reused for every new curve.
+    Sensitivities are analytic. A key rate is the continuously compounded
+    zero rate at one pillar of the curve; as the curve is log-linear in
+    discount factors, each cash flow depends on at most two pillars, and
+    bumping all pillars together is a parallel shift of the whole curve.
+    """
+
+    def __init__(self):
+        self._coupons = []
+        self._frequencies = []
+        self._counts = []
+        self._notionals = []
+        self._cash_flows = None
+
+    def add_position(self, bond, quantity=1.0):
+        """ Hold quantity bonds, each of the bond's face value; negative for a short position.
+        """
+        self.add_positions([bond.get_coupon()], [bond.get_compounding_frequency()],
+                           [bond.get_count_coupon_payments()], [quantity * bond.get_face_value()])
+
+    def add_positions(self, coupons, compounding_frequencies, count_coupon_payments, notionals):
+        """ Add many positions at once: annual coupons in percent, coupon periods
+        per year, number of periods to maturity and face amounts held.
+        """
+        self._coupons.extend(np.asarray(coupons, dtype=float).ravel())
+        self._frequencies.extend(np.asarray(compounding_frequencies, dtype=float).ravel())
+        self._counts.extend(np.asarray(count_coupon_payments, dtype=int).ravel())
+        self._notionals.extend(np.asarray(notionals, dtype=float).ravel())
+        self._cash_flows = None
+
+    def get_position_count(self):
+        return len(self._notionals)
+
+    def _layout(self):
+        """ Flat (position index, time, amount) arrays of all cash flows.
+        """
+        if self._cash_flows is None:
+            counts = np.array(self._counts, dtype=int)
+            frequencies = np.array(self._frequencies)
+            notionals = np.array(self._notionals)
+            positions = np.repeat(np.arange(len(counts)), counts)
+            ends = np.cumsum(counts)
+            periods = np.arange(1, ends[-1] + 1 if len(ends) else 1) - np.repeat(ends - counts, counts)
+            times = periods / frequencies[positions]
+            amounts = (notionals * np.array(self._coupons) / 100.0 / frequencies)[positions]
+            amounts[ends[counts > 0] - 1] += notionals[counts > 0]
+            self._cash_flows = positions, times, amounts
+        return self._cash_flows
+
+    def price(self, term_structure):
+        """ Present values and sensitivities of every position against the curve.
+        :return: PortfolioRisk with per-position pvs and dv01s, their totals,
+                 and per-pillar key-rate dv01s and key-rate durations of the portfolio;
+                 dv01s are the value lost for a one basis point rise in rates
+        """
+        curve = term_structure.curve
+        positions, times, amounts = self._layout()
+        pillar_count = len(curve.times) - 1
+
+        # log discount factor = (1 - weight) * log df of the left pillar + weight * log df of the right one
+        segments = np.clip(np.searchsorted(curve.times, times, side='right') - 1, 0, pillar_count - 1)
+        left_times = curve.times[segments]
+        weights = (times - left_times) / (curve.times[segments + 1] - left_times)
+        log_dfs = curve.log_dfs[segments] + weights * (curve.log_dfs[segments + 1] - curve.log_dfs[segments])
+        values = amounts * np.exp(log_dfs)
+
+        # d log df(pillar) / d zero rate(pillar) = -pillar time; pillar 0 is the fixed curve origin
+        left_exposures = values * (1.0 - weights) * left_times * 1e-4
+        right_exposures = values * weights * curve.times[segments + 1] * 1e-4
+        key_rate_dv01s = (np.bincount(segments, right_exposures, minlength=pillar_count) +
+                          np.bincount(segments, left_exposures, minlength=pillar_count + 1)[1:])
+
+        position_count = self.get_position_count()
+        pvs = np.bincount(positions, values, minlength=position_count)
+        dv01s = np.bincount(positions, values * times * 1e-4, minlength=position_count)
+        pv = pvs.sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            key_rate_durations = key_rate_dv01s / pv * 1e4
+        return PortfolioRisk(pvs, dv01s, pv, dv01s.sum(), key_rate_dv01s, key_rate_durations)
@@ -0,0 +1,278 @@
+import math
+
+import numpy as np
+
+
+class Curve(object):
+    """ Discount curve that is log-linear in discount factors between pillars.
+    The per-segment intercepts and slopes of the log discount factor are
+    computed once, so every query is a binary search for the segment plus a
+    few array operations, for any number of times at once. The curve starts
+    from a discount factor of 1 at time 0 and is extrapolated at the last
+    segment's forward rate beyond the last pillar.
+    """
+
+    def __init__(self, tenors, discount_factors):
+        self.times = np.concatenate(([0.0], np.asarray(tenors, dtype=float)))
+        self.log_dfs = np.concatenate(([0.0], np.log(np.asarray(discount_factors, dtype=float))))
+        if len(self.times) > 1:
+            self.slopes = np.diff(self.log_dfs) / np.diff(self.times)
+        else:
+            self.slopes = np.zeros(1)
+        self.intercepts = self.log_dfs[:len(self.slopes)] - self.slopes * self.times[:len(self.slopes)]
+
+    def log_discount(self, times):
+        times = np.asarray(times, dtype=float)
+        segments = np.clip(np.searchsorted(self.times, times, side='right') - 1, 0, len(self.slopes) - 1)
+        return self.intercepts[segments] + self.slopes[segments] * times
+
+    def discount(self, times):
+        """ Discount factors at the given times in years.
+        """
+        return np.exp(self.log_discount(times))
+
+    def forward(self, start_times, end_times):
+        """ Annualized simple forward rates in percent between start and end times.
+        Where a start equals its end the instantaneous forward rate is returned.
+        """
+        start_times, end_times = np.broadcast_arrays(np.asarray(start_times, dtype=float),
+                                                     np.asarray(end_times, dtype=float))
+        log_ratio = self.log_discount(start_times) - self.log_discount(end_times)
+        periods = end_times - start_times
+        instantaneous = periods == 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            forwards = np.expm1(log_ratio) / periods
+        if instantaneous.any():
+            segments = np.clip(np.searchsorted(self.times, start_times, side='right') - 1, 0, len(self.slopes) - 1)
+            forwards = np.where(instantaneous, -self.slopes[segments], forwards)
+        return forwards * 100.0
+
+
+def bootstrap_discount_factors(prices, coupons, compounding_frequencies, count_coupon_payments,
+                               tolerance=1e-14, max_iterations=50):
+    """ Bootstrap pillar discount factors from bills and coupon bonds sorted by maturity.
+    Prices are per 100 of face value and coupons annual percentages; bond i
+    matures after count_coupon_payments[i] periods of 1 / compounding_frequencies[i]
+    years. Cash flows up to the previous pillar are discounted with the discount
+    factors already fixed, and those in the new segment with log-linear
+    interpolation towards the unknown pillar, so each instrument needs a single
+    one-dimensional Newton solve over its own cash flows. Raises ValueError
+    for an instrument whose pillar cannot be solved.
+    :return: (tenors in years, discount factors) as arrays
+    """
+    count = len(prices)
+    pillar_times = np.zeros(count + 1)
+    pillar_log_dfs = np.zeros(count + 1)
+    solve_pillars(prices, coupons, compounding_frequencies, count_coupon_payments, pillar_times, pillar_log_dfs,
+                  0, tolerance, max_iterations)
+    return pillar_times[1:], np.exp(pillar_log_dfs[1:])
+
+
+def solve_pillars(prices, coupons, compounding_frequencies, count_coupon_payments, pillar_times, pillar_log_dfs,
+                  start=0, tolerance=1e-14, max_iterations=50):
+    """ Solve pillars start and later in place, see bootstrap_discount_factors.
+    pillar_times and pillar_log_dfs have one entry more than there are bonds,
+    the curve origin at index 0, and the entries up to start must already be
+    solved; a pillar only depends on the ones before it, so a price change
+    never requires solving the pillars before the changed instrument again.
+    The value of an instrument's cash flows in the new segment rises from 0
+    towards infinity with the pillar's log discount factor, so a pillar
+    exists exactly when the price is above the value of the cash flows on the
+    fixed part of the curve. Newton's method is applied to the log of the
+    segment value, which is convex in the log discount factor with a slope of
+    at least the smallest segment weight, so it converges from any start
+    without overflowing. A pillar that is infeasible or does not converge
+    raises ValueError and is not stored, so the pillars from it onwards stay
+    unsolved.
+    """
+    for index in range(start, len(prices)):
+        frequency = float(compounding_frequencies[index])
+        payments = int(count_coupon_payments[index])
+        maturity = payments / frequency
+        last_time, last_log_df = pillar_times[index], pillar_log_dfs[index]
+        if maturity <= last_time:
+            raise ValueError(f'Instrument {index} does not mature after the previous pillar.')
+
+        times = np.arange(1, payments + 1) / frequency
+        cash_flows = np.full(payments, coupons[index] / 100.0 / frequency)
+        cash_flows[-1] += 1.0
+        target = prices[index] / 100.0
+
+        # cash flows on the fixed part of the curve are discounted once
+        known = times <= last_time
+        known_value = np.dot(cash_flows[known], np.exp(np.interp(times[known], pillar_times[:index + 1],
+                                                                 pillar_log_dfs[:index + 1])))
+        segment_flows = cash_flows[~known]
+        segment_weights = (times[~known] - last_time) / (maturity - last_time)
+        if not target > known_value:
+            raise ValueError(f'Instrument {index} is priced at or below the value of its cash flows '
+                             f'up to the previous pillar.')
+        paying = segment_flows > 0.0
+        log_flows = np.log(segment_flows[paying]) + last_log_df * (1.0 - segment_weights[paying])
+        segment_weights = segment_weights[paying]
+        log_segment_target = math.log(target - known_value)
+
+        # start from the current forward rate carried to the new maturity
+        if index > 0:
+            log_df = last_log_df + (maturity - last_time) * last_log_df / last_time
+        else:
+            log_df = math.log(target)
+        for _ in range(max_iterations):
+            # log of the segment value and its slope, scaled by the largest term
+            exponents = log_flows + segment_weights * log_df
+            largest = exponents.max()
+            terms = np.exp(exponents - largest)
+            total = terms.sum()
+            step = (largest + math.log(total) - log_segment_target) / (np.dot(terms, segment_weights) / total)
+            log_df -= step
+            if abs(step) <= tolerance:
+                break
+        else:
+            raise ValueError(f'Pillar of instrument {index} did not converge in {max_iterations} iterations.')
+
+        pillar_times[index + 1] = maturity
+        pillar_log_dfs[index + 1] = log_df
+
+
+class TermStructure(object):
+    """ Curve bootstrapped from a set of bonds, one pillar per bond maturity.
+    Pillars are solved when the curve is first read and then cached. After
+    update_price only the changed instrument's pillar and the pillars after it
+    are solved again, and spot, discount and forward rates are recomputed the
+    first time they are read after a change.
+    """
+
+    def __init__(self):
+        self.bonds = []
+        self._prices = np.zeros(0)
+        self._coupons = np.zeros(0)
+        self._frequencies = np.zeros(0)
+        self._counts = np.zeros(0, dtype=int)
+        self._pillar_times = np.zeros(1)
+        self._pillar_log_dfs = np.zeros(1)
+        self._solved_count = 0
+        self._curve = None
+        self._rates = {}
+
+    def set_bonds(self, bonds):
+        self.bonds = sorted(bonds, key=lambda bond: bond.get_time_to_maturity())
+        self._prices = np.array([bond.get_price() for bond in self.bonds], dtype=float)
+        self._coupons = np.array([bond.get_coupon() for bond in self.bonds], dtype=float)
+        self._frequencies = np.array([bond.get_compounding_frequency() for bond in self.bonds], dtype=float)
+        self._counts = np.array([bond.get_count_coupon_payments() for bond in self.bonds], dtype=int)
+        self._pillar_times = np.zeros(len(self.bonds) + 1)
+        self._pillar_log_dfs = np.zeros(len(self.bonds) + 1)
+        self._solved_count = 0
+        self._curve = None
+        self._rates = {}
+
+    def update_price(self, index, price):
+        """ Set the price of the index-th bond in maturity order. Its pillar and
+        the ones after it are solved again the next time the curve is read.
+        """
+        bond = self.bonds[index]
+        bond.set_price(price, bond.get_face_value())
+        if price == self._prices[index]:
+            return
+        self._prices[index] = price
+        self._solved_count = min(self._solved_count, index)
+        self._curve = None
+        self._rates = {}
+
+    @property
+    def curve(self):
+        if self._solved_count < len(self.bonds):
+            solve_pillars(self._prices, self._coupons, self._frequencies, self._counts,
+                          self._pillar_times, self._pillar_log_dfs, self._solved_count)
+            self._solved_count = len(self.bonds)
+        if self._curve is None:
+            self._curve = Curve(self._pillar_times[1:], np.exp(self._pillar_log_dfs[1:]))
+        return self._curve
+
+    def _cached_rates(self, name, compute):
+        rates = self._rates.get(name)
+        if rates is None:
+            rates = self._rates[name] = compute()
+        return rates
+
+    @property
+    def tenors(self):
+        return self._cached_rates('tenors', lambda: self.curve.times[1:].tolist())
+
+    @property
+    def compounding_frequencies(self):
+        return self._frequencies.tolist()
+
+    @property
+    def spot_rates(self):
+        """ Spot rates quoted with each pillar bond's own compounding frequency,
+        so for bills the spot rate equals the yield-to-maturity.
+        """
+        def compute():
+            curve = self.curve
+            frequencies = self._frequencies
+            return (frequencies * np.expm1(-curve.log_dfs[1:] / (frequencies * curve.times[1:])) * 100.0).tolist()
+        return self._cached_rates('spot_rates', compute)
+
+    @property
+    def discount_factors(self):
+        return self._cached_rates('discount_factors', lambda: np.exp(self.curve.log_dfs[1:]).tolist())
+
+    @property
+    def forward_1m_rates(self):
+        return self._cached_rates('forward_1m_rates', lambda: self.compute_forward_rates(1.0 / 12.0))
+
+    @property
+    def forward_3m_rates(self):
+        return self._cached_rates('forward_3m_rates', lambda: self.compute_forward_rates(3.0 / 12.0))
+
+    @property
+    def forward_6m_rates(self):
+        return self._cached_rates('forward_6m_rates', lambda: self.compute_forward_rates(6.0 / 12.0))
+
+    def get_tenor(self, index):
+        return self.tenors[index]
+
+    def get_spot_rate(self, index):
+        return self.spot_rates[index]
+
+    def get_forward_1m_rate(self, index):
+        return self.forward_1m_rates[index]
+
+    def get_forward_3m_rate(self, index):
+        return self.forward_3m_rates[index]
+
+    def get_forward_6m_rate(self, index):
+        return self.forward_6m_rates[index]
+
+    def get_discount_factor(self, index):
+        return self.discount_factors[index]
+
+    def compute_spot_rates(self):
+        """ Solve the curve now rather than when it is first read.
+        """
+        return self.spot_rates
+
+    def compute_discount_factors(self):
+        return self.discount_factors
+
+    def compute_forward_rates(self, horizon):
+        """ Annualized simple forward rates in percent from every pillar to horizon years later.
+        Forwards that would end beyond the last pillar are left at 0.
+        """
+        tenors = self.curve.times[1:]
+        forwards = self.curve.forward(tenors, tenors + horizon)
+        return np.where(tenors + horizon <= tenors[-1] + 1e-9, forwards, 0.0).tolist()
+
+    def discount(self, times):
+        """ Discount factors at arbitrary times in years, see Curve.discount.
+        """
+        return self.curve.discount(times)
+
+    def forward(self, start_times, end_times):
+        """ Forward rates in percent between arbitrary times in years, see Curve.forward.
+        """
+        return self.curve.forward(start_times, end_times)
+
+    def compute_forward_1m_rates(self):
+        return self.forward_1m_rates, self.forward_3m_rates, self.forward_6m_rates
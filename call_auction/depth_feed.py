@@ -0,0 +1,176 @@
+"""
+Market-by-price (L2) depth feed on top of OrderBook.
+
+A subscriber to the top N levels first receives a DepthSnapshot and then one
+DepthUpdate per change inside its view, in the order they have to be applied:
+    new     insert a level at index `level`, shifting worse levels down
+    change  set the size of the level at index `level`
+    delete  remove the level at index `level`, shifting worse levels up
+Level 0 is the best price. When a level enters the top N the level pushed out
+is deleted, and when a level leaves it the next one slides in as a new level.
+"""
+
+import heapq
+from bisect import bisect_left
+from collections import namedtuple
+
+from orderbook import BUY, SELL
+
+DepthSnapshot = namedtuple('DepthSnapshot', ['bids', 'offers'])
+DepthUpdate = namedtuple('DepthUpdate', ['action', 'side', 'level', 'price', 'size'])
+
+
+class DepthSide(object):
+    """Levels of one side of the book as seen by a DepthFeed.
+    Only the best `width` levels, width being the deepest subscription, are
+    held in order: their sort keys in a list ascending from the best price
+    and their sizes in a dict. The other levels are a set of sort keys with a
+    heap over it from which levels that have left the set are dropped
+    lazily, and their sizes are read from the book when they move up into
+    the window. Sort keys are prices for offers and negated prices for bids.
+    """
+    def __init__(self, sign, book_sizes):
+        self.sign = sign
+        self.book_sizes = book_sizes
+        self.width = 0
+        self.keys = []
+        self.sizes = {}
+        self.outside = set(sign * price for price in book_sizes)
+        self.outside_heap = list(self.outside)
+        heapq.heapify(self.outside_heap)
+
+    def widen(self, width):
+        self.width = max(self.width, width)
+        self.fill()
+
+    def fill(self):
+        """Move the best levels from outside into the window until it is full
+        or there are none left.
+        """
+        while len(self.keys) < self.width and self.outside_heap:
+            key = heapq.heappop(self.outside_heap)
+            if key not in self.outside:
+                continue
+            self.outside.discard(key)
+            price = self.sign * key
+            size = self.book_sizes.get(price, 0)
+            if size > 0:
+                self.keys.append(key)
+                self.sizes[price] = size
+
+    def push_out(self):
+        """Move the worst level of an overfull window outside.
+        """
+        key = self.keys.pop()
+        del self.sizes[self.sign * key]
+        self.outside.add(key)
+        heapq.heappush(self.outside_heap, key)
+
+    def add_outside(self, key):
+        if key not in self.outside:
+            self.outside.add(key)
+            heapq.heappush(self.outside_heap, key)
+            if len(self.outside_heap) > 2 * len(self.outside) + 64:
+                self.outside_heap = list(self.outside)
+                heapq.heapify(self.outside_heap)
+
+
+class DepthFeed(object):
+    """Publishes depth snapshots and per-level deltas for an OrderBook.
+    Each side is a DepthSide: the levels within the deepest subscription
+    are kept in order with their sizes, so a change there is located by a
+    binary search and costs O(depth) to insert or remove, and a change
+    further down the book costs at most a heap push, O(log levels). Changes
+    are applied one at a time, which keeps the sequence of updates
+    consistent even when one book operation changes several levels.
+    """
+    def __init__(self, order_book):
+        self.order_book = order_book
+        self.bids = DepthSide(-1.0, order_book.bid_sizes)
+        self.offers = DepthSide(1.0, order_book.offer_sizes)
+        self.subscribers = []
+        order_book.add_level_listener(self.on_level_changes)
+
+    def _side(self, side):
+        if side == BUY:
+            return self.bids
+        return self.offers
+
+    def snapshot(self, depth):
+        """Top depth levels of each side as lists of (price, size), best first.
+        """
+        self.bids.widen(depth)
+        self.offers.widen(depth)
+        bids = [(-key, self.bids.sizes[-key]) for key in self.bids.keys[:depth]]
+        offers = [(key, self.offers.sizes[key]) for key in self.offers.keys[:depth]]
+        return DepthSnapshot(bids, offers)
+
+    def subscribe(self, callback, depth=10):
+        """Send callback a snapshot of the top depth levels and from then on
+        every DepthUpdate within them.
+        """
+        callback(self.snapshot(depth))
+        self.subscribers.append((depth, callback))
+
+    def unsubscribe(self, callback):
+        self.subscribers = [(depth, subscriber) for depth, subscriber in self.subscribers
+                            if subscriber is not callback]
+
+    def on_level_changes(self, changes):
+        for side, price, size in changes:
+            depth_side = self._side(side)
+            keys, level_sizes, sign = depth_side.keys, depth_side.sizes, depth_side.sign
+            key = sign * price
+            index = bisect_left(keys, key)
+            exists = index < len(keys) and keys[index] == key
+
+            if exists and size == 0:
+                del keys[index]
+                del level_sizes[price]
+                depth_side.fill()
+                for depth, callback in self.subscribers:
+                    if index < depth:
+                        callback(DepthUpdate('delete', side, index, price, 0))
+                        if len(keys) >= depth:
+                            slid_price = sign * keys[depth - 1]
+                            callback(DepthUpdate('new', side, depth - 1, slid_price, level_sizes[slid_price]))
+            elif exists:
+                if size == level_sizes[price]:
+                    continue
+                level_sizes[price] = size
+                for depth, callback in self.subscribers:
+                    if index < depth:
+                        callback(DepthUpdate('change', side, index, price, size))
+            elif size == 0:
+                depth_side.outside.discard(key)
+            elif index < depth_side.width and key not in depth_side.outside:
+                keys.insert(index, key)
+                level_sizes[price] = size
+                for depth, callback in self.subscribers:
+                    if index < depth:
+                        callback(DepthUpdate('new', side, index, price, size))
+                        if len(keys) > depth:
+                            callback(DepthUpdate('delete', side, depth, sign * keys[depth], 0))
+                if len(keys) > depth_side.width:
+                    depth_side.push_out()
+            else:
+                depth_side.add_outside(key)
+
+
+class DepthView(object):
+    """Subscriber that rebuilds the top levels from a snapshot and updates.
+    """
+    def __init__(self):
+        self.levels = {BUY: [], SELL: []}
+
+    def __call__(self, message):
+        if isinstance(message, DepthSnapshot):
+            self.levels = {BUY: list(message.bids), SELL: list(message.offers)}
+            return
+        levels = self.levels[message.side]
+        if message.action == 'new':
+            levels.insert(message.level, (message.price, message.size))
+        elif message.action == 'change':
+            levels[message.level] = (message.price, message.size)
+        else:
+            del levels[message.level]
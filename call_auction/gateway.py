@@ -0,0 +1,144 @@
+"""
+Local asyncio order-entry gateway in front of OrderBook.
+
+Clients send one message per line:
+    N <ref> <B|S> <price> <size>    new limit order
+    C <ref> <order_id>              cancel a resting order
+    A <ref> <order_id> <size>       amend the size of a resting order
+and get one reply per message, in order:
+    ACK <ref> <order_id> <filled> <remaining>
+    REJ <ref> <reason>
+Order ids are the book's own, never reused, so a cancel or amend for an
+order that has been filled or cancelled is rejected as unknown-order.
+Messages that arrive during one event-loop iteration are applied to the book
+as a single batch and their acknowledgements are written back together.
+"""
+
+import argparse
+import asyncio
+import math
+
+from orderbook import BUY, MAX_SIZE, SELL, Order, OrderBook
+
+SIDES = {'B': BUY, 'S': SELL}
+
+
+class OrderGateway(object):
+
+    def __init__(self, order_book=None):
+        self.order_book = order_book if order_book is not None else OrderBook()
+        self.pending = []
+        self.flush_scheduled = False
+        self.loop = None
+        self.message_count = 0
+        self.batch_count = 0
+
+    def submit(self, connection, line):
+        """Queue a message; the queue is applied to the book once per event-loop iteration.
+        """
+        self.pending.append((connection, line))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.loop.call_soon(self.flush)
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        self.flush_scheduled = False
+        self.message_count += len(pending)
+        self.batch_count += 1
+
+        connections = set()
+        for connection, line in pending:
+            connection.replies.append(self.apply(line))
+            connections.add(connection)
+        for connection in connections:
+            connection.send_replies()
+
+    def apply(self, line):
+        """Apply one message, given as the bytes of its line, to the order book
+        and return its reply line.
+        """
+        fields = line.split()
+        ref = fields[1].decode('ascii', 'backslashreplace') if len(fields) > 1 else '-'
+        try:
+            fields = line.decode('ascii').split()
+            message_type = fields[0]
+            if message_type == 'N':
+                order = Order(SIDES.get(fields[2]), float(fields[3]), int(fields[4]))
+                if (order.side is None or not 0 < order.size <= MAX_SIZE
+                        or not math.isfinite(order.price)):
+                    return f'REJ {ref} malformed'
+                size = order.size
+                self.order_book.process_order(order)
+                return f'ACK {ref} {order.order_id} {size - order.size} {order.size}'
+            elif message_type == 'C':
+                order = self.order_book.cancel_order(int(fields[2]))
+                return f'ACK {ref} {order.order_id} 0 0'
+            elif message_type == 'A':
+                size = int(fields[3])
+                if size > MAX_SIZE:
+                    return f'REJ {ref} malformed'
+                order = self.order_book.amend_order(int(fields[2]), size)
+                return f'ACK {ref} {order.order_id} 0 {max(size, 0)}'
+            return f'REJ {ref} unknown-message'
+        except KeyError:
+            return f'REJ {ref} unknown-order'
+        except (IndexError, ValueError, ArithmeticError):
+            return f'REJ {ref} malformed'
+        except Exception:
+            # one bad message must not take the rest of its batch down with it
+            return f'REJ {ref} internal-error'
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        self.loop = asyncio.get_running_loop()
+        return await self.loop.create_server(lambda: GatewayProtocol(self), host, port)
+
+
+class GatewayProtocol(asyncio.Protocol):
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self.transport = None
+        self.partial = b''
+        self.replies = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        for line in lines:
+            if line.strip():
+                self.gateway.submit(self, line)
+
+    def send_replies(self):
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(('\n'.join(self.replies) + '\n').encode('ascii'))
+        self.replies = []
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+
+async def run_gateway(host, port):
+    gateway = OrderGateway()
+    server = await gateway.serve(host, port)
+    print(f'Order gateway listening on {host}:{port}')
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the order-entry gateway.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_gateway(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Load-generating client for the order-entry gateway.
+
+Sends a seeded stream of new, cancel and amend messages in batches, optionally
+paced to a target message rate, and reports throughput and acknowledgement
+latency percentiles as JSON. Cancels and amends go to order ids acknowledged
+as resting; an id the gateway rejects as unknown, because its order has been
+filled since, is not used again.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+class RestingIds(object):
+    """Order ids believed to be resting: a list for uniform random picks and a
+    dict from id to list index, so adding, removing and picking an id are O(1).
+    An id is removed by moving the last id into its place.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, order_id):
+        if order_id not in self.index:
+            self.index[order_id] = len(self.ids)
+            self.ids.append(order_id)
+
+    def discard(self, order_id):
+        position = self.index.pop(order_id, None)
+        if position is None:
+            return
+        last_id = self.ids.pop()
+        if last_id != order_id:
+            self.ids[position] = last_id
+            self.index[last_id] = position
+
+    def choice(self, rng):
+        return self.ids[rng.randrange(len(self.ids))]
+
+    def pop_random(self, rng):
+        order_id = self.choice(rng)
+        self.discard(order_id)
+        return order_id
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q / 100.0 * len(sorted_values)))]
+
+
+async def run_load(host, port, count, rate=None, batch_size=100, cancel_ratio=0.1, amend_ratio=0.1, seed=None):
+    """Send count messages to the gateway and wait for all acknowledgements.
+    rate is the target number of messages per second, None to send as fast as possible.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    sent = {}
+    latencies = []
+    resting_ids = RestingIds()
+    rejects = 0
+
+    async def read_replies():
+        nonlocal rejects
+        for _ in range(count):
+            line = await reader.readline()
+            received = time.perf_counter()
+            fields = line.split()
+            sent_time, target_id = sent.pop(int(fields[1]))
+            latencies.append(received - sent_time)
+            if fields[0] != b'ACK':
+                rejects += 1
+                if target_id is not None:
+                    resting_ids.discard(target_id)
+            elif target_id is None and int(fields[4]) > 0:
+                resting_ids.add(int(fields[2]))
+
+    reader_task = asyncio.create_task(read_replies())
+    start = time.perf_counter()
+    interval = batch_size / rate if rate else 0.0
+    for batch_index, first_ref in enumerate(range(0, count, batch_size)):
+        lines, target_ids = [], []
+        for ref in range(first_ref, min(first_ref + batch_size, count)):
+            draw = rng.random()
+            if resting_ids and draw < cancel_ratio:
+                order_id = resting_ids.pop_random(rng)
+                lines.append(f'C {ref} {order_id}')
+                target_ids.append(order_id)
+            elif resting_ids and draw < cancel_ratio + amend_ratio:
+                order_id = resting_ids.choice(rng)
+                lines.append(f'A {ref} {order_id} {rng.randint(1, 100)}')
+                target_ids.append(order_id)
+            else:
+                side = rng.choice('BS')
+                price = round(rng.normalvariate(100.0, 0.5), 2)
+                lines.append(f'N {ref} {side} {price} {rng.randint(1, 100)}')
+                target_ids.append(None)
+
+        now = time.perf_counter()
+        for ref, target_id in zip(range(first_ref, first_ref + len(lines)), target_ids):
+            sent[ref] = (now, target_id)
+        writer.write(('\n'.join(lines) + '\n').encode('ascii'))
+        await writer.drain()
+
+        if interval:
+            delay = start + (batch_index + 1) * interval - time.perf_counter()
+            await asyncio.sleep(max(delay, 0.0))
+        else:
+            await asyncio.sleep(0)
+
+    await reader_task
+    elapsed = time.perf_counter() - start
+    writer.close()
+    await writer.wait_closed()
+
+    latencies.sort()
+    return {'messages': count, 'batch_size': batch_size, 'target_rate': rate, 'elapsed_s': elapsed,
+            'throughput_msgs_per_s': count / elapsed, 'rejects': rejects,
+            'ack_latency_p50_us': percentile(latencies, 50) * 1e6,
+            'ack_latency_p90_us': percentile(latencies, 90) * 1e6,
+            'ack_latency_p99_us': percentile(latencies, 99) * 1e6,
+            'ack_latency_max_us': latencies[-1] * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate order flow against the order-entry gateway.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--rate', type=float, default=None, help='messages per second, default unpaced')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    result = asyncio.run(run_load(args.host, args.port, args.count, args.rate, args.batch_size, seed=args.seed))
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
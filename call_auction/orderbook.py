@@ -5,86 +5,385 @@ Created on Wed Mar  1 10:43:28 2020
 @author: wenyu
 """
 
-from queue import Queue
+import heapq
+import math
+import numbers
+from array import array
+from collections import namedtuple
 BUY = 0
 SELL = 1
+FREE = -1
+NO_SLOT = -1
+MAX_SIZE = 2**63 - 1
+
+Trade = namedtuple('Trade', ['buy_order_id', 'sell_order_id', 'price', 'size'])
+
+
+def whole_units(size):
+    """Order size as an int; sizes are whole units, so a float size must not
+    have a fractional part, and they must be positive and fit the pool's
+    int64 size array.
+    """
+    if isinstance(size, numbers.Integral):
+        units = int(size)
+    elif isinstance(size, numbers.Real) and float(size).is_integer():
+        units = int(size)
+    else:
+        raise ValueError(f'Order size must be a whole number of units, got {size!r}.')
+    if not 0 < units <= MAX_SIZE:
+        raise ValueError(f'Order size must be between 1 and {MAX_SIZE} units, got {size!r}.')
+    return units
+
+
+class OrderPool(object):
+    """Struct-of-arrays storage for orders.
+    Every order in the book occupies an integer slot in flat arrays of sides,
+    prices and sizes. Orders resting at the same price are chained through
+    the next/prev slot arrays in time priority. Slots of filled or cancelled
+    orders go on a free list and are reused, so slots are internal: orders
+    are known by their order ids, which map to their slot only while they are
+    in the book. The prices as quoted are kept for display, the float copies
+    are used for matching.
+    """
+    def __init__(self):
+        self.sides = array('b')
+        self.prices = array('d')
+        self.sizes = array('q')
+        self.next_slots = array('q')
+        self.prev_slots = array('q')
+        self.free_slots = array('q')
+        self.quoted_prices = []
+        self.order_ids = []
+        self.slots = {}
+        self.count = 0
+
+    def allocate(self, order_id, side, price, size):
+        if order_id in self.slots:
+            raise KeyError(f'Order {order_id} is already in the book.')
+        quoted_price, price = price, float(price)
+        self.count += 1
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.sides[slot] = side
+            self.prices[slot] = price
+            self.sizes[slot] = size
+            self.next_slots[slot] = NO_SLOT
+            self.prev_slots[slot] = NO_SLOT
+            self.quoted_prices[slot] = quoted_price
+            self.order_ids[slot] = order_id
+        else:
+            slot = len(self.sides)
+            self.sides.append(side)
+            self.prices.append(price)
+            self.sizes.append(size)
+            self.next_slots.append(NO_SLOT)
+            self.prev_slots.append(NO_SLOT)
+            self.quoted_prices.append(quoted_price)
+            self.order_ids.append(order_id)
+        self.slots[order_id] = slot
+        return slot
+
+    def release(self, slot):
+        self.count -= 1
+        self.sides[slot] = FREE
+        del self.slots[self.order_ids[slot]]
+        self.quoted_prices[slot] = None
+        self.order_ids[slot] = None
+        self.free_slots.append(slot)
+
+    def slot_of(self, order_id):
+        """Slot of an order in the book; KeyError for an order id that is
+        unknown or whose order has been filled or cancelled.
+        """
+        return self.slots[order_id]
+
+    def to_order(self, slot):
+        return Order(self.sides[slot], self.quoted_prices[slot], self.sizes[slot], self.order_ids[slot])
+
 
 class OrderBook(object):
-    def__init__(self):
-        self.bid_prices = []
-        self.bid_sizes = []
-        self.offer_prices = []
-        self.offer_sizes = []
+    """Continuous limit order book with price-time priority.
+    Resting orders live in an OrderPool. Each side keeps a dict from price to
+    the [first, last] slots of that level's FIFO chain, the total size per
+    level and a heap of level prices. Inserting a new level costs O(log n),
+    the best bid and offer are read from the top of the heaps and emptied
+    levels are dropped from the heaps lazily, and a heap is rebuilt once its
+    stale prices outnumber the live levels. Order sizes are whole units.
+    Orders without an order id are numbered from next_order_id, and ids
+    given by the caller are kept, so ids are never reused by the book.
+    """
+    def __init__(self):
+        self.pool = OrderPool()
         self.bids = {}
         self.offers = {}
-        self.unprocessed_buy_orders = Queue()
-        self.unprocessed_sell_orders = Queue()
-        
+        self.bid_sizes = {}
+        self.offer_sizes = {}
+        self.bid_heap = []
+        self.offer_heap = []
+        self.trades = []
+        self.level_listeners = []
+        self.changed_levels = {}
+        self.next_order_id = 1
+
+    def add_level_listener(self, listener):
+        """Call listener(changes) after every book operation that changed price
+        levels, with changes a list of (side, price, size) and size 0 for a
+        level that is gone.
+        """
+        self.level_listeners.append(listener)
+
+    def _touch_level(self, side, price):
+        if self.level_listeners:
+            self.changed_levels[(side, price)] = None
+
+    def _publish_levels(self):
+        if not self.changed_levels:
+            return
+        changes = []
+        for side, price in self.changed_levels:
+            level_sizes = self.bid_sizes if side == BUY else self.offer_sizes
+            changes.append((side, price, level_sizes.get(price, 0)))
+        self.changed_levels = {}
+        for listener in self.level_listeners:
+            listener(changes)
+
     def max_bid_price(self):
-        if self.bids:
-            return max(self.bids.keys())
-        
+        while self.bid_heap and -self.bid_heap[0] not in self.bids:
+            heapq.heappop(self.bid_heap)
+        if self.bid_heap:
+            return -self.bid_heap[0]
+
     def max_bid_qtd(self):
-        if self.bids:
-            return max(self.bids.values())
+        price = self.max_bid_price()
+        if price is not None:
+            return self.bid_sizes[price]
 
     def min_offer_price(self):
-        if self.offers:
-            return min(self.offers.keys())
-        
+        while self.offer_heap and self.offer_heap[0] not in self.offers:
+            heapq.heappop(self.offer_heap)
+        if self.offer_heap:
+            return self.offer_heap[0]
+
     def min_offer_qtd(self):
-        if self.offers:
-            return max(self.offers.values())
-        
-    def main(self):
-        #determine if the new order can be filled under the original order book
+        price = self.min_offer_price()
+        if price is not None:
+            return self.offer_sizes[price]
+
+    def process_order(self, new_order):
+        """Match a new limit order against the opposite side of the book and
+        rest whatever is left of it. Returns the list of trades it generated.
+        """
+        # validate everything before the order takes an id or a pool slot
+        size = whole_units(new_order.size)
+        if new_order.side not in (BUY, SELL):
+            raise ValueError(f'Order side must be BUY or SELL, got {new_order.side!r}.')
+        price = new_order.price
+        if not math.isfinite(float(price)):
+            raise ValueError(f'Order price must be finite, got {price!r}.')
+        if new_order.order_id is None:
+            new_order.order_id = self.next_order_id
+        elif new_order.order_id in self.pool.slots:
+            raise KeyError(f'Order {new_order.order_id} is already in the book.')
+        if isinstance(new_order.order_id, numbers.Integral):
+            self.next_order_id = max(self.next_order_id, new_order.order_id + 1)
+        slot = self.pool.allocate(new_order.order_id, new_order.side, price, size)
+
         if new_order.side == BUY:
-            if new_order.price >= self.min_offer_price:
-                self.unprocessed_buy_orders(new_order)
-            else:
-                self.bids.append(new_order)
+            trades = self._match(slot, self.offers, self.offer_sizes, self.min_offer_price)
+            if self.pool.sizes[slot] > 0:
+                self._rest(slot, price, self.bids, self.bid_sizes, self.bid_heap, -price)
         else:
-            if new_order.price <= self.max_bid_price:
-                self.unprocessed_sell_orders(new_order)
-            else:
-                self.offers.append(new_order)
-        #ensure price is the priority, then comes the time priority at the same price level
-        while not unprocessed_buy_orders.empty():
-            if unprocessed_buy_orders.get().size <= self.min_offer_qtd:
-                self.min_offer_qtd.pop(unprocessed_buy_orders.get().size)
-            else:
-                while unprocessed_buy_orders.get().size >= self.min_offer_qtd:
-                    self.min_offer_qtd.pop()
-            
-        while not unprocessed_sell_orders.empty():
-            if unprocessed_sell_orders.get().size >= self.min_offer_qtd:
-                self.min_buy_qtd.pop(unprocessed_sell_orders.get().size)
+            trades = self._match(slot, self.bids, self.bid_sizes, self.max_bid_price)
+            if self.pool.sizes[slot] > 0:
+                self._rest(slot, price, self.offers, self.offer_sizes, self.offer_heap, price)
+        new_order.size = self.pool.sizes[slot]
+        if new_order.size == 0:
+            self.pool.release(slot)
+        self.trades.extend(trades)
+        self._publish_levels()
+        return trades
+
+    def _match(self, slot, levels, level_sizes, best_price):
+        #price is the priority, then comes the time priority at the same price level
+        pool = self.pool
+        sizes, next_slots, order_ids = pool.sizes, pool.next_slots, pool.order_ids
+        trades = []
+        is_buy = pool.sides[slot] == BUY
+        limit_price = pool.prices[slot]
+        size = sizes[slot]
+        while size > 0:
+            price = best_price()
+            if price is None or (price > limit_price if is_buy else price < limit_price):
+                break
+            level = levels[price]
+            resting_slot = level[0]
+            self._touch_level(SELL if is_buy else BUY, price)
+            while size > 0 and resting_slot != NO_SLOT:
+                fill = min(size, sizes[resting_slot])
+                if is_buy:
+                    trades.append(Trade(order_ids[slot], order_ids[resting_slot], price, fill))
+                else:
+                    trades.append(Trade(order_ids[resting_slot], order_ids[slot], price, fill))
+                size -= fill
+                sizes[resting_slot] -= fill
+                level_sizes[price] -= fill
+                if sizes[resting_slot] == 0:
+                    filled_slot, resting_slot = resting_slot, next_slots[resting_slot]
+                    pool.release(filled_slot)
+            if resting_slot == NO_SLOT:
+                del levels[price]
+                del level_sizes[price]
             else:
-                while unprocessed_buy_orders.get().size <= self.min_buy_qtd:
-                    self.min_buy_qtd.pop()
+                level[0] = resting_slot
+                pool.prev_slots[resting_slot] = NO_SLOT
+        sizes[slot] = size
+        return trades
+
+    def _rest(self, slot, price, levels, level_sizes, heap, heap_key):
+        self._touch_level(self.pool.sides[slot], price)
+        level = levels.get(price)
+        if level is None:
+            levels[price] = [slot, slot]
+            level_sizes[price] = self.pool.sizes[slot]
+            heapq.heappush(heap, heap_key)
+            if len(heap) > 2 * len(levels) + 64:
+                # emptied levels leave stale keys behind, so rebuild the heap
+                # from the live levels once they outnumber them
+                if heap is self.bid_heap:
+                    heap[:] = [-level_price for level_price in levels]
+                else:
+                    heap[:] = levels
+                heapq.heapify(heap)
+            return
+        self.pool.next_slots[level[1]] = slot
+        self.pool.prev_slots[slot] = level[1]
+        level[1] = slot
+        level_sizes[price] += self.pool.sizes[slot]
+
+    def resting_order(self, order_id):
+        """Return a resting order as an Order, or None if it is not in the book.
+        """
+        slot = self.pool.slots.get(order_id)
+        if slot is not None:
+            return self.pool.to_order(slot)
+
+    def _unlink(self, level, slot):
+        """Take a slot out of its price level's FIFO chain.
+        """
+        pool = self.pool
+        prev_slot, next_slot = pool.prev_slots[slot], pool.next_slots[slot]
+        if prev_slot == NO_SLOT:
+            level[0] = next_slot
+        else:
+            pool.next_slots[prev_slot] = next_slot
+        if next_slot == NO_SLOT:
+            level[1] = prev_slot
+        else:
+            pool.prev_slots[next_slot] = prev_slot
+
+    def cancel_order(self, order_id):
+        """Remove a resting order from the book and return it. Raises KeyError
+        for an order id that is unknown or already filled or cancelled.
+        """
+        pool = self.pool
+        slot = pool.slot_of(order_id)
+        order = pool.to_order(slot)
+        if order.side == BUY:
+            levels, level_sizes = self.bids, self.bid_sizes
+        else:
+            levels, level_sizes = self.offers, self.offer_sizes
+
+        level = levels[order.price]
+        self._unlink(level, slot)
+        level_sizes[order.price] -= order.size
+        if level[0] == NO_SLOT:
+            del levels[order.price]
+            del level_sizes[order.price]
+        pool.release(slot)
+        self._touch_level(order.side, order.price)
+        self._publish_levels()
+        return order
+
+    def amend_order(self, order_id, size):
+        """Change the size of a resting order and return it. A smaller size
+        keeps the order's time priority, a larger one moves it to the back of
+        its price level and a size of zero cancels it. Raises KeyError for an
+        order id that is unknown or already filled or cancelled.
+        """
+        pool = self.pool
+        slot = pool.slot_of(order_id)
+        if isinstance(size, numbers.Real) and size <= 0:
+            return self.cancel_order(order_id)
+        size = whole_units(size)
+
+        price = pool.quoted_prices[slot]
+        if pool.sides[slot] == BUY:
+            levels, level_sizes = self.bids, self.bid_sizes
+        else:
+            levels, level_sizes = self.offers, self.offer_sizes
+        old_size = pool.sizes[slot]
+        pool.sizes[slot] = size
+        level_sizes[price] += size - old_size
+        if size > old_size and pool.next_slots[slot] != NO_SLOT:
+            level = levels[price]
+            self._unlink(level, slot)
+            pool.next_slots[level[1]] = slot
+            pool.prev_slots[slot] = level[1]
+            pool.next_slots[slot] = NO_SLOT
+            level[1] = slot
+        self._touch_level(pool.sides[slot], price)
+        self._publish_levels()
+        return pool.to_order(slot)
+
+    def level_orders(self, levels, price):
+        """Resting orders at one price level in time priority.
+        """
+        slot = levels[price][0]
+        while slot != NO_SLOT:
+            yield self.pool.to_order(slot)
+            slot = self.pool.next_slots[slot]
 
     def print_orderbook(self):
         print("Resulting order book after execution is: ")
         print("Buy side:")
-        for i in self.bids:
-            print(self.bids[i])
+        for price in sorted(self.bids, reverse=True):
+            for order in self.level_orders(self.bids, price):
+                print(order)
         print()
         print("Sell side:")
-        for i in self.offers:
-            print(self.offers[i])
+        for price in sorted(self.offers):
+            for order in self.level_orders(self.offers, price):
+                print(order)
 
 
 
 
 class Order(object):
     """Initialize new orders, assume market buy order price is 1e10 and
-    market sell order price is 1e-10. Orders with price quotations are 
+    market sell order price is 1e-10. Orders with price quotations are
     limit orders.
     """
-    def __init__(self, side, price, size):
+    __slots__ = ('side', 'price', 'size', 'order_id')
+
+    def __init__(self, side, price, size, order_id=None):
         self.side = side
         self.price = price
         self.size = size
+        self.order_id = order_id
 
     def __repr__(self):
         return f'{self.side} {self.size} units at {self.price}'
+
+
+def main():
+    order_book = OrderBook()
+    for order in [Order(SELL, 101, 10), Order(SELL, 102, 5), Order(SELL, 101, 5),
+                  Order(BUY, 99, 10), Order(BUY, 100, 5), Order(BUY, 101, 12),
+                  Order(SELL, 1e-10, 8)]:
+        for trade in order_book.process_order(order):
+            print(trade)
+    order_book.print_orderbook()
+
+
+if __name__ == '__main__':
+    main()